@@ -1,5 +1,6 @@
 from abc import ABC , abstractmethod
 import pandas as pd 
+from analyze_src.statistics_engine import StatisticsEngine, default_engine
 
 
 ## Data Inspection Strategy 
@@ -15,13 +16,23 @@ class DataTypesInspectionStrategy(DataInspectionStrategy):
         print(df.info())## It will provide a concise summary of DataFrame 
 
 
-## df.describe() provides descriptive statistics such as count, mean, standard deviation, quartiles, and range for numerical columns in a DataFrame.
+## Descriptive statistics such as count, mean, standard deviation, quartiles, and range for numerical columns
+## and count , unique , top , freq for categorical columns , the same tables as df.describe().
+## They come from the shared statistics engine , so the frame is scanned once per dataset version.
+## version -> name of the dataset version , None keys the cache on the frame object , its shape ,
+##            columns and dtypes. Values edited in place are not noticed , pass a new version (or
+##            an engine with content_hash=True) after editing the frame , e.g. in a notebook.
 class SummaryStatisticsInspectionStrategy(DataInspectionStrategy):
+    def __init__(self,engine:StatisticsEngine=None,version:str=None):
+        self.engine = engine or default_engine
+        self.version = version
+
     def inspect(self, df:pd.DataFrame):
+        statistics = self.engine.get(df,self.version)
         print("\n Summary Statistics(Numerical Features):")
-        print(df.describe())
+        print(statistics.numeric_summary)
         print("\n Summary Statistics(Categorical features):")
-        print(df.describe(include="object"))
+        print(statistics.categorical_summary)
 
 ## We want which DataInspector to use     
 class DataInspector:
@@ -2,33 +2,61 @@ from abc import ABC, abstractmethod
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from analyze_src.large_data_rendering import FigureRenderer, default_renderer, histogram_2d, plot_histogram_2d, reservoir_sample, stratified_sample
 
 ## Abstract class to implement analyze method in every class 
+## max_points -> frames with more rows are drawn in large data mode (binned or sampled)
+## large_data -> "binned" or "sample" , how NumericalvsNumericalAnalysis draws those frames
+## renderer -> FigureRenderer(output_dir) writes the figures to files instead of showing them
 class BiVariateAnalysisStrategy(ABC):
+    def __init__(self,max_points=100_000,bins=100,renderer:FigureRenderer=None,large_data="binned"):
+        if large_data not in ("binned","sample"):
+            raise ValueError(f"Unknown large data mode {large_data}. Use 'binned' or 'sample'.")
+        self.max_points = max_points
+        self.bins = bins
+        self.large_data = large_data
+        self.renderer = renderer or default_renderer
+
     @abstractmethod
     def analyze(self,df:pd.DataFrame,feature1:str,feature2:str):
         pass
 
 ## This is the class for num vs num analysis 
 ## between two numerical features
+## Past max_points rows the scatter becomes a 2D histogram of all rows (bins x bins cells) ,
+## or with large_data="sample" a scatter of a uniform reservoir sample of max_points rows.
+## In sample mode df can also be an iterable of chunks (e.g. StreamingZipDataIngestor().ingest(path)) ,
+## the sample is then drawn in one pass without loading the whole file.
 class NumericalvsNumericalAnalysis(BiVariateAnalysisStrategy):
     def analyze(self, df:pd.DataFrame, feature1:str, feature2:str):
-        plt.figure(figsize=(10,6))
-        sns.scatterplot(x=feature1,y=feature2,data=df)
+        if self.large_data == "sample":
+            columns = [feature1,feature2]
+            df = reservoir_sample(df[columns] if isinstance(df,pd.DataFrame) else (chunk[columns] for chunk in df),self.max_points)
+        figure = plt.figure(figsize=(10,6))
+        if len(df) > self.max_points:
+            counts,x_edges,y_edges = histogram_2d(df[feature1],df[feature2],bins=self.bins)
+            mesh = plot_histogram_2d(plt.gca(),counts,x_edges,y_edges)
+            figure.colorbar(mesh,label="Count")
+        else:
+            sns.scatterplot(x=feature1,y=feature2,data=df)
         plt.title(f"{feature1} V/S {feature2}")
         plt.xlabel(feature1)
         plt.ylabel(feature2)
-        plt.show()
+        self.renderer.render(f"{feature1}_vs_{feature2}",figure)
         
+## Past max_points rows the boxes are drawn from a sample stratified on the category ,
+## so every category keeps its share of rows and rare ones are not lost
 class CategoricalvsNumericalAnalysis(BiVariateAnalysisStrategy):
     def analyze(self, df:pd.DataFrame, feature1:str, feature2:str):
-        plt.figure(figsize=(10,6))
+        if len(df) > self.max_points:
+            df = stratified_sample(df[[feature1,feature2]],feature1,self.max_points)
+        figure = plt.figure(figsize=(10,6))
         sns.boxplot(x=feature1,y=feature2,data=df)
         plt.title(f"{feature1} V/s {feature2} ")
         plt.xlabel(feature1)
         plt.ylabel(feature2)
         plt.xticks(rotation=45)
-        plt.show() 
+        self.renderer.render(f"{feature1}_vs_{feature2}",figure)
         
 class BiVariateAnalyzer:
     def __init__(self,strategy:BiVariateAnalysisStrategy):
@@ -0,0 +1,125 @@
+import os
+import re
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
+import numpy as np
+import pandas as pd
+
+
+## Uniform sample of n rows from a frame or from an iterable of frames (e.g. the chunks of
+## StreamingZipDataIngestor) in one pass , without holding more than n rows (Algorithm R).
+## Within a chunk the replacements are drawn at once , a later row overwriting the same slot wins
+## exactly as in the row by row algorithm.
+def reservoir_sample(data,n:int,random_state=42) -> pd.DataFrame:
+    rng = np.random.default_rng(random_state)
+    if isinstance(data,pd.DataFrame):
+        if len(data) <= n:
+            return data
+        return data.iloc[np.sort(rng.choice(len(data),size=n,replace=False))]
+
+    reservoir = None
+    seen = 0
+    for chunk in data:
+        if reservoir is None or len(reservoir) < n:
+            fill = n - (0 if reservoir is None else len(reservoir))
+            head = chunk.iloc[:fill]
+            reservoir = head if reservoir is None else pd.concat([reservoir,head])
+            seen += len(head)
+            chunk = chunk.iloc[fill:]
+        if len(chunk) == 0:
+            continue
+        ## row i (0 based over the whole stream) replaces slot j ~ U[0 , i] when j < n
+        slots = rng.integers(0,seen + np.arange(1,len(chunk) + 1))
+        rows = np.flatnonzero(slots < n)
+        seen += len(chunk)
+        if len(rows) == 0:
+            continue
+        take = np.arange(n)
+        take[slots[rows]] = n + np.arange(len(rows))
+        reservoir = pd.concat([reservoir,chunk.iloc[rows]]).iloc[take]
+    return reservoir
+
+
+## Sample of n rows keeping the share of every group of `column`. Each group first gets
+## min_per_group rows (or all of them , lowered to n // number of groups when there are many
+## groups) so rare categories still show up in the plot , the rest of n is shared in proportion.
+def stratified_sample(df:pd.DataFrame,column:str,n:int,min_per_group=50,random_state=42) -> pd.DataFrame:
+    if len(df) <= n:
+        return df
+    rng = np.random.default_rng(random_state)
+    codes,_ = pd.factorize(df[column])
+    sizes = np.bincount(codes[codes >= 0])
+    n = min(n,sizes.sum())  ## rows with a missing group are never kept
+    base = np.minimum(sizes,min(min_per_group,n // max(len(sizes),1)))
+    rest = sizes - base
+    share = rest * (n - base.sum())
+    quota = base + share // max(rest.sum(),1)
+    ## rows lost to rounding down go to the groups with the largest remainders
+    quota[np.argsort(-(share % max(rest.sum(),1)),kind="stable")[:n - quota.sum()]] += 1
+    ## a random key per row , the rows with the smallest keys of every group are kept
+    order = np.lexsort((rng.random(len(df)),codes))
+    order = order[codes[order] >= 0]
+    starts = np.concatenate([[0],np.cumsum(sizes)[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts,sizes)
+    keep = order[rank < np.repeat(quota,sizes)]
+    return df.iloc[np.sort(keep)]
+
+
+## 2D histogram of two numerical columns over all rows (rows with a missing value are dropped)
+## returns counts (bins x bins) , x edges , y edges
+def histogram_2d(x,y,bins=100):
+    x = np.asarray(x,dtype=np.float64)
+    y = np.asarray(y,dtype=np.float64)
+    present = ~(np.isnan(x) | np.isnan(y))
+    return np.histogram2d(x[present],y[present],bins=bins)
+
+
+## Missing value matrix shrunk to at most max_rows rows : every output row is the fraction of
+## missing values of a block of consecutive input rows , so the pattern along the file is kept.
+def downsample_missing_matrix(df:pd.DataFrame,max_rows=500) -> pd.DataFrame:
+    missing = df.isna().to_numpy()
+    if len(df) <= max_rows:
+        return pd.DataFrame(missing.astype(np.float64),columns=df.columns)
+    starts = np.linspace(0,len(df),max_rows,endpoint=False).astype(np.int64)
+    counts = np.add.reduceat(missing.astype(np.int32),starts,axis=0)
+    sizes = np.diff(np.append(starts,len(df)))
+    return pd.DataFrame(counts / sizes[:,None],index=df.index[starts],columns=df.columns)
+
+
+## Draw a precomputed 2D histogram , empty bins are left blank and the colours are on a log scale
+def plot_histogram_2d(ax,counts,x_edges,y_edges,cmap="viridis"):
+    masked = np.ma.masked_equal(counts.T,0)
+    mesh = ax.pcolormesh(x_edges,y_edges,masked,cmap=cmap,norm=LogNorm() if masked.count() else None)
+    return mesh
+
+
+## Shows the finished figure or , with an output directory , writes it there as a file.
+## Writing to files switches matplotlib to the non interactive Agg backend so it works on
+## servers without a display. The written paths are collected in `saved`.
+class FigureRenderer:
+    def __init__(self,output_dir:str=None,file_format="png",dpi=100):
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.dpi = dpi
+        self.saved = []
+        if output_dir is not None:
+            os.makedirs(output_dir,exist_ok=True)
+            if matplotlib.get_backend().lower() != "agg":
+                plt.switch_backend("Agg")
+
+    def render(self,name:str,figure=None):
+        figure = figure or plt.gcf()
+        if self.output_dir is None:
+            plt.show()
+            return None
+        file_name = re.sub(r"[^\w.-]+","_",name).strip("_") + "." + self.file_format
+        path = os.path.join(self.output_dir,file_name)
+        figure.savefig(path,dpi=self.dpi,bbox_inches="tight")
+        plt.close(figure)
+        self.saved.append(path)
+        return path
+
+
+## Interactive default used by the analysis strategies
+default_renderer = FigureRenderer()
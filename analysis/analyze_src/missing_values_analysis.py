@@ -2,6 +2,8 @@ from abc import ABC,abstractmethod
 import matplotlib.pyplot as plt
 import pandas as pd 
 import seaborn as sns 
+from analyze_src.large_data_rendering import FigureRenderer, default_renderer, downsample_missing_matrix
+from analyze_src.statistics_engine import StatisticsEngine, default_engine
 
 class MissingValueAnalysisTemplate(ABC):
     def analyze(self,df:pd.DataFrame):
@@ -16,18 +18,31 @@ class MissingValueAnalysisTemplate(ABC):
         pass
     
     
+## The missing counts come from the shared statistics engine (one scan per dataset version)
+## max_rows -> the heatmap has at most this many rows , each one the missing share of a block of rows
+## renderer -> FigureRenderer(output_dir) writes the heatmap to a file instead of showing it
 class SimpleMissingValuesAnalysis(MissingValueAnalysisTemplate):
+    def __init__(self,engine:StatisticsEngine=None,version:str=None,max_rows=500,renderer:FigureRenderer=None):
+        self.engine = engine or default_engine
+        self.version = version
+        self.max_rows = max_rows
+        self.renderer = renderer or default_renderer
+
     def identify_missing_values(self, df:pd.DataFrame):
         print("Missing values count by column: ")
-        missing_values = df.isnull().sum()
+        missing_values = self.engine.get(df,self.version).missing_counts
         print(missing_values)
     
     def visualize_missing_values(self, df:pd.DataFrame):
         print("Visualizing Missing Values: ")
-        plt.figure(figsize=(12,8))
-        sns.heatmap(df.isnull(),cbar=False,cmap="viridis")
+        figure = plt.figure(figsize=(12,8))
+        if len(df) > self.max_rows:
+            sns.heatmap(downsample_missing_matrix(df,self.max_rows),cmap="viridis",vmin=0,vmax=1,
+                        cbar_kws={"label": "Share missing"})
+        else:
+            sns.heatmap(df.isnull(),cbar=False,cmap="viridis")
         plt.title("Missing Values Heatmap")
-        plt.show()
+        self.renderer.render("missing_values_heatmap",figure)
         
 
 if __name__ == "__main__":
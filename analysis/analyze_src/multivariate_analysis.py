@@ -1,7 +1,10 @@
 from abc import ABC , abstractmethod
 import matplotlib.pyplot as plt 
+import numpy as np
 import seaborn as sns 
 import pandas as pd
+from analyze_src.large_data_rendering import FigureRenderer, default_renderer, histogram_2d, plot_histogram_2d
+from analyze_src.statistics_engine import StatisticsEngine, default_engine
 
 class MultiVariateAnalysisTemplate(ABC):
     def analyze(self,df:pd.DataFrame):
@@ -16,17 +19,51 @@ class MultiVariateAnalysisTemplate(ABC):
         pass
     
 
+## The correlation matrix (numerical columns) comes from the shared statistics engine
+## max_points -> past this many rows the pair plot is drawn from 2D histograms of all rows
+## renderer -> FigureRenderer(output_dir) writes the figures to files instead of showing them
 class SimpleMultiVariateAnalysis(MultiVariateAnalysisTemplate):
+    def __init__(self,engine:StatisticsEngine=None,version:str=None,max_points=100_000,bins=50,renderer:FigureRenderer=None):
+        self.engine = engine or default_engine
+        self.version = version
+        self.max_points = max_points
+        self.bins = bins
+        self.renderer = renderer or default_renderer
+
     def generate_correlation_heatmap(self, df:pd.DataFrame):
-        plt.figure(figsize=(12,10))
-        sns.heatmap(df.corr(),annot=True,fmt=".2f",cmap="coolwarm",linewidths=0.5)
+        figure = plt.figure(figsize=(12,10))
+        sns.heatmap(self.engine.get(df,self.version).correlation,annot=True,fmt=".2f",cmap="coolwarm",linewidths=0.5)
         plt.title("Correlation Heatmap")
-        plt.show()
+        self.renderer.render("correlation_heatmap",figure)
     
     def generate_pairplot(self, df:pd.DataFrame):
-        sns.pairplot(df)
-        plt.suptitle("Pair plot of selected features",y=1.02)
-        plt.show()
+        if len(df) > self.max_points:
+            figure = self._binned_pairplot(df.select_dtypes(include="number"))
+        else:
+            figure = sns.pairplot(df).figure
+        figure.suptitle("Pair plot of selected features",y=1.02)
+        self.renderer.render("pair_plot",figure)
+
+    ## Same grid as sns.pairplot , histograms on the diagonal and 2D histograms elsewhere ,
+    ## every cell computed from all rows with numpy instead of one marker per row
+    def _binned_pairplot(self,df:pd.DataFrame):
+        columns = list(df.columns)
+        values = {column: df[column].to_numpy(dtype=np.float64) for column in columns}
+        figure,axes = plt.subplots(len(columns),len(columns),figsize=(2.5 * len(columns),2.5 * len(columns)),squeeze=False)
+        for i,y_column in enumerate(columns):
+            for j,x_column in enumerate(columns):
+                ax = axes[i,j]
+                if i == j:
+                    x = values[x_column]
+                    counts,edges = np.histogram(x[~np.isnan(x)],bins=self.bins)
+                    ax.stairs(counts,edges,fill=True)
+                else:
+                    counts,x_edges,y_edges = histogram_2d(values[x_column],values[y_column],bins=self.bins)
+                    plot_histogram_2d(ax,counts,x_edges,y_edges)
+                ax.set_xlabel(x_column if i == len(columns) - 1 else "")
+                ax.set_ylabel(y_column if j == 0 else "")
+        figure.tight_layout()
+        return figure
         
 if __name__=="__main__":
     #Load the data
@@ -0,0 +1,120 @@
+import hashlib
+import weakref
+import numpy as np
+import pandas as pd
+
+
+## Everything the analysis strategies need , computed once per dataset version
+## numeric_summary -> count , mean , std , min , 25% , 50% , 75% , max (like df.describe())
+## categorical_summary -> count , unique , top , freq (like df.describe(include="object"))
+## missing_counts -> missing values per column
+## histograms -> {column: (counts , bin edges)} for every numeric column
+## value_counts -> {column: counts} for every categorical column
+## correlation -> pairwise complete Pearson correlation of the numeric columns (like df.corr())
+class DatasetStatistics:
+    def __init__(self,df:pd.DataFrame,bins=30):
+        numeric = df.select_dtypes(include="number")
+        categorical = df.select_dtypes(exclude="number")
+        self.n_rows = len(df)
+        self.dtypes = df.dtypes
+
+        ## One pass over the numeric block as a single float array
+        block = numeric.to_numpy(dtype=np.float64)
+        present = ~np.isnan(block)
+        count = present.sum(axis=0)
+        with np.errstate(invalid="ignore",divide="ignore"):
+            mean = np.nanmean(block,axis=0) if block.size else np.empty(0)
+            std = np.nanstd(block,axis=0,ddof=1) if block.size else np.empty(0)
+            quantiles = np.nanpercentile(block,[0,25,50,75,100],axis=0) if block.size else np.empty((5,0))
+        self.numeric_summary = pd.DataFrame(
+            [count,mean,std,*quantiles],
+            index=["count","mean","std","min","25%","50%","75%","max"],
+            columns=numeric.columns,
+        )
+        self.correlation = self._correlation(block,present,mean,numeric.columns)
+        self.histograms = {}
+        for i,column in enumerate(numeric.columns):
+            values = block[present[:,i],i]
+            if len(values):
+                self.histograms[column] = np.histogram(values,bins=bins)
+
+        self.value_counts = {column: categorical[column].value_counts() for column in categorical.columns}
+        self.categorical_summary = pd.DataFrame({
+            column: {
+                "count": int(counts.sum()),
+                "unique": len(counts),
+                "top": counts.index[0] if len(counts) else None,
+                "freq": int(counts.iloc[0]) if len(counts) else None,
+            }
+            for column,counts in self.value_counts.items()
+        })
+
+        missing_numeric = pd.Series(self.n_rows - count,index=numeric.columns)
+        missing_categorical = pd.Series(
+            {column: self.n_rows - int(counts.sum()) for column,counts in self.value_counts.items()},dtype=np.int64)
+        self.missing_counts = pd.concat([missing_numeric,missing_categorical]).reindex(df.columns).astype(np.int64)
+
+    ## Pairwise complete correlation from five matrix products on the centered block ,
+    ## pairs only use the rows where both columns are present (as pandas does).
+    @staticmethod
+    def _correlation(block,present,mean,columns) -> pd.DataFrame:
+        mask = present.astype(np.float64)
+        centered = np.where(present,block - mean,0.0)
+        n = mask.T @ mask
+        sum_x = centered.T @ mask
+        sum_y = mask.T @ centered
+        sum_xx = (centered ** 2).T @ mask
+        sum_yy = mask.T @ centered ** 2
+        sum_xy = centered.T @ centered
+        with np.errstate(invalid="ignore",divide="ignore"):
+            covariance = n * sum_xy - sum_x * sum_y
+            variance = (n * sum_xx - sum_x ** 2) * (n * sum_yy - sum_y ** 2)
+            correlation = np.clip(covariance / np.sqrt(variance),-1,1)
+        correlation[n < 2] = np.nan
+        return pd.DataFrame(correlation,index=columns,columns=columns)
+
+
+## Caches DatasetStatistics per dataset version so every analysis strategy shares one scan.
+## version -> any string naming the dataset version (e.g. the hash of the source archive)
+## None keys the cache on the frame object itself plus its shape , columns and dtypes , which
+## costs nothing per call. The entry is dropped when the frame is garbage collected. Values
+## changed in place are not noticed , pass a version or content_hash=True (hashes every value ,
+## a full scan per call) for frames that are edited between analyses.
+class StatisticsEngine:
+    def __init__(self,bins=30,max_cached=8,content_hash=False):
+        self.bins = bins
+        self.max_cached = max_cached
+        self.content_hash = content_hash
+        self._cache = {}
+
+    @staticmethod
+    def fingerprint(df:pd.DataFrame) -> str:
+        digest = hashlib.sha256()
+        digest.update(repr(list(df.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df,index=True).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def _key(self,df:pd.DataFrame,version:str):
+        if version is not None:
+            return version
+        if self.content_hash:
+            return self.fingerprint(df)
+        return (id(df),df.shape,tuple(df.columns),tuple(map(str,df.dtypes)))
+
+    def get(self,df:pd.DataFrame,version:str=None) -> DatasetStatistics:
+        key = self._key(df,version)
+        if key not in self._cache:
+            if len(self._cache) >= self.max_cached:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[key] = DatasetStatistics(df,bins=self.bins)
+            if isinstance(key,tuple):
+                ## the id can be reused by a new frame once this one is gone
+                weakref.finalize(df,self._cache.pop,key,None)
+        return self._cache[key]
+
+    def clear(self):
+        self._cache = {}
+
+
+## Shared engine used by the analysis strategies unless they are given their own
+default_engine = StatisticsEngine()
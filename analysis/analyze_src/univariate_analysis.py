@@ -2,12 +2,24 @@ from abc import ABC ,abstractmethod
 import pandas as pd 
 import matplotlib.pyplot as plt 
 import seaborn as sns
+from analyze_src.large_data_rendering import FigureRenderer, default_renderer
+from analyze_src.statistics_engine import StatisticsEngine, default_engine
 
 
 ## This is for the one variable analysis in the dataframe 
 ## df -> DataFrame and Feature -> column or variable to analyze 
 ## returns the visual distribution of the feature.
+## The bins / counts come from the shared statistics engine , so analyzing many features of the
+## same frame scans it only once. version -> name of the dataset version , None keys the cache on
+## the frame object , its shape , columns and dtypes , so values edited in place are not noticed.
+## Pass a new version (or an engine with content_hash=True) after editing the frame.
+## renderer -> FigureRenderer(output_dir) writes the figures to files instead of showing them
 class UnivariateAnalysisStrategy(ABC):
+    def __init__(self,engine:StatisticsEngine=None,version:str=None,renderer:FigureRenderer=None):
+        self.engine = engine or default_engine
+        self.version = version
+        self.renderer = renderer or default_renderer
+
     @abstractmethod
     def analyze(self,df:pd.DataFrame,feature:str):
         pass
@@ -15,25 +27,28 @@ class UnivariateAnalysisStrategy(ABC):
 ## Histogram gives us the freq distribution of a numerical feature by grouping values into intervals called bins.
 ## KDE refers to Kernel Density Estimation
 ## It refers to smooth continuous estimate of the Probabbility density function of a numerical feature.
+## The precomputed histogram is drawn as weighted bin centers , the KDE is then fitted on the 30 bins.
 class NumericalUnivariateAnalysis(UnivariateAnalysisStrategy):
     def analyze(self, df:pd.DataFrame , feature:str):
-        plt.figure(figsize=(10,6))
-        sns.histplot(df[feature],kde=True,bins=30)
+        counts,edges = self.engine.get(df,self.version).histograms[feature]
+        figure = plt.figure(figsize=(10,6))
+        sns.histplot(x=(edges[:-1] + edges[1:]) / 2,weights=counts,bins=len(counts),binrange=(edges[0],edges[-1]),kde=True)
         plt.title(f"Distribution of {feature}")
         plt.xlabel(feature)
         plt.ylabel("Frequency")
-        plt.show()
+        self.renderer.render(f"distribution_{feature}",figure)
 
 ## We do categorical analysis as for a particular feature which category occur more nu. of times
 class CategoricalUnivariateAnalysis(UnivariateAnalysisStrategy):
     def analyze(self, df:pd.DataFrame, feature:str):
-        plt.figure(figsize=(10,6))
-        sns.countplot(x=feature,data=df,palette="muted")
+        counts = self.engine.get(df,self.version).value_counts[feature]
+        figure = plt.figure(figsize=(10,6))
+        sns.barplot(x=counts.index.astype(str),y=counts.to_numpy(),hue=counts.index.astype(str),palette="muted",legend=False)
         plt.title(f"Distribution of {feature}")
         plt.xlabel(feature)
         plt.ylabel("Count")
         plt.xticks(rotation=45)
-        plt.show()
+        self.renderer.render(f"distribution_{feature}",figure)
         
 class UnivariateAnalyzer:
     def __init__(self,strategy:UnivariateAnalysisStrategy):
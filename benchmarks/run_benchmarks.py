@@ -0,0 +1,162 @@
+## Benchmarks for the preprocessing and training hot paths on synthetic Ames-like data.
+## Run from the project root :
+##   python -m benchmarks.run_benchmarks --scales 10 100 1000
+##   python -m benchmarks.run_benchmarks --scales 10 --baseline benchmarks/results/<older run>.json
+## Every stage is timed (best of --repeat runs) and its peak python memory is measured with
+## tracemalloc in one extra run. Results are written to benchmarks/results/ and, when a
+## baseline is given, stages slower or bigger than the baseline by more than --threshold are
+## flagged and the exit code is 1.
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+import numpy as np
+import pandas as pd
+import sklearn
+from benchmarks.synthetic_data import make_synthetic_ames
+from src.ingest_data import ZipDataIngestor
+from src.handle_missing_value import FillMissingValuesStrategy, MissingValueHandler
+from src.outlier_detection import OutlierDetector, ZScoreOutlierDetection
+from src.feature_engineering import FeatureEngineer, OneHotEncoding, StandardScaling
+from src.data_splitter import DataDSplitter, SimpleTrainTestSplit
+from src.model_building import LinearRegressionStrategy, ModelBuilder
+from src.model_evaluator import ModelEvaluator, RegressionModelEvaluationStrategy
+
+RESULTS_DIR = os.path.join("benchmarks","results")
+TARGET = "SalePrice"
+
+
+def _ingest(zip_path:str) -> pd.DataFrame:
+    ## ZipDataIngestor extracts into ./extracted_data , so run it inside the temp directory
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(zip_path))
+    try:
+        return ZipDataIngestor().ingest(zip_path)
+    finally:
+        os.chdir(cwd)
+
+
+## Stage name -> (function , name of the input it takes). Inputs are prepared once per scale
+## so every stage is measured on its own.
+def build_stages(df:pd.DataFrame,zip_path:str) -> dict:
+    numeric = df.select_dtypes(include="number")
+    filled = numeric.fillna(numeric.mean())
+    categorical = list(df.select_dtypes(exclude="number").columns)
+    X_train,X_test,y_train,y_test = SimpleTrainTestSplit().split_data(filled,TARGET)
+    model = LinearRegressionStrategy().build_and_train_model(X_train,y_train)
+    return {
+        "ingest": lambda: _ingest(zip_path),
+        "fill": lambda: MissingValueHandler(FillMissingValuesStrategy("mean")).handle_missing_values(df),
+        "outlier": lambda: OutlierDetector(ZScoreOutlierDetection(threshold=3)).handle_outliers(filled),
+        "scale": lambda: FeatureEngineer(StandardScaling(list(filled.columns))).apply_feature_engineering(filled),
+        "onehot": lambda: FeatureEngineer(OneHotEncoding(categorical)).apply_feature_engineering(df),
+        "onehot_sparse": lambda: FeatureEngineer(OneHotEncoding(categorical,sparse=True)).apply_feature_engineering(df),
+        "split": lambda: DataDSplitter(SimpleTrainTestSplit()).split(filled,TARGET),
+        "fit": lambda: ModelBuilder(LinearRegressionStrategy()).build_model(X_train,y_train),
+        "evaluate": lambda: ModelEvaluator(RegressionModelEvaluationStrategy()).evaluate(model,X_test,y_test),
+    }
+
+
+def measure(func,repeat:int,memory=True) -> dict:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    result = {"wall_s": min(timings)}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        func()
+        result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024**2
+        tracemalloc.stop()
+    return result
+
+
+def run(scales,stages=None,repeat=3,memory=True) -> list:
+    results = []
+    for scale in scales:
+        logging.info(f"Generating synthetic data at {scale}x.")
+        df = make_synthetic_ames(scale)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            zip_path = os.path.join(tmp_dir,"synthetic.zip")
+            with zipfile.ZipFile(zip_path,"w",compression=zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("synthetic.csv",df.to_csv(index=False))
+            for name,func in build_stages(df,zip_path).items():
+                if stages and name not in stages:
+                    continue
+                record = {"stage": name,"scale": scale,"rows": len(df)}
+                try:
+                    record.update(measure(func,repeat,memory))
+                    record["rows_per_s"] = len(df) / record["wall_s"]
+                    record["status"] = "ok"
+                except MemoryError:
+                    record["status"] = "out of memory"
+                logging.info(f"{name} at {scale}x: {record}")
+                results.append(record)
+        del df
+    return results
+
+
+def compare(results:list,baseline_path:str,threshold:float) -> list:
+    with open(baseline_path) as f:
+        baseline = {(record["stage"],record["scale"]): record for record in json.load(f)["results"]}
+    regressions = []
+    for record in results:
+        old = baseline.get((record["stage"],record["scale"]))
+        if old is None or record["status"] != "ok" or old.get("status") != "ok":
+            continue
+        for metric in ("wall_s","peak_mb"):
+            if metric in record and metric in old and record[metric] > old[metric] * (1 + threshold):
+                regressions.append(f"{record['stage']} at {record['scale']}x: {metric} {old[metric]:.4g} -> {record[metric]:.4g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the preprocessing and training stages.")
+    parser.add_argument("--scales",type=float,nargs="+",default=[10,100,1000])
+    parser.add_argument("--stages",nargs="+",default=None)
+    parser.add_argument("--repeat",type=int,default=3)
+    parser.add_argument("--no-memory",action="store_true",help="skip the tracemalloc run")
+    parser.add_argument("--baseline",default=None,help="earlier results file to compare against")
+    parser.add_argument("--threshold",type=float,default=0.2,help="allowed slowdown before flagging , 0.2 = 20%%")
+    parser.add_argument("--output",default=None)
+    args = parser.parse_args()
+
+    results = run(args.scales,args.stages,args.repeat,memory=not args.no_memory)
+    output = args.output or os.path.join(RESULTS_DIR,time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".",exist_ok=True)
+    with open(output,"w") as f:
+        json.dump({
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "scikit-learn": sklearn.__version__,
+            },
+            "results": results,
+        },f,indent=2)
+    logging.info(f"Benchmark results written to {output}")
+    print(pd.DataFrame(results).to_string(index=False))
+
+    if args.baseline:
+        regressions = compare(results,args.baseline,args.threshold)
+        for regression in regressions:
+            logging.warning(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+AMES_CSV = "extracted_data/AmesHousing.csv"
+
+
+## Build an Ames-like frame `scale` times the size of AmesHousing.csv.
+## Rows are drawn with replacement from the real data so the column mix , the categories and
+## the missingness pattern of every row stay the same. Numeric values get a small
+## multiplicative jitter so the frame is not just repeated rows , identifiers are renumbered.
+def make_synthetic_ames(scale:float,source_csv=AMES_CSV,jitter=0.05,random_state=42) -> pd.DataFrame:
+    rng = np.random.default_rng(random_state)
+    base = pd.read_csv(source_csv)
+    n_rows = int(len(base) * scale)
+    df = base.iloc[rng.integers(0,len(base),size=n_rows)].reset_index(drop=True)
+
+    id_columns = [column for column in ("Order","PID") if column in df.columns]
+    ## year / month / count like columns keep their exact values
+    exact_columns = [column for column in df.columns if "Yr" in column or "Year" in column or "Mo Sold" in column]
+    numeric_columns = df.select_dtypes(include="number").columns.difference(id_columns + exact_columns)
+    for column in numeric_columns:
+        values = df[column].to_numpy(dtype=np.float64)
+        noise = 1 + rng.normal(0,jitter,size=n_rows)
+        jittered = values * noise
+        if pd.api.types.is_integer_dtype(base[column]):
+            jittered = np.round(jittered)
+        df[column] = jittered.astype(base[column].dtype) if not np.isnan(jittered).any() else jittered
+    if "Order" in df.columns:
+        df["Order"] = np.arange(1,n_rows + 1)
+    if "PID" in df.columns:
+        df["PID"] = np.arange(n_rows,dtype=np.int64) + 500_000_000
+    return df
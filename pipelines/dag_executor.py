@@ -0,0 +1,90 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+logging.basicConfig(level=logging.INFO,format="%(asctime)s - %(levelname)s - %(message)s",force=True)
+
+
+## Runs one node and measures it where it runs. time.time is used so the timings of process
+## workers line up with the ones measured in the parent.
+def _timed_call(func,args):
+    start = time.time()
+    result = func(*args)
+    return result,start,time.time(),f"{os.getpid()}:{threading.current_thread().name}"
+
+
+## Runs pipeline steps described as a dependency graph.
+## add_node(name , func , depends_on) -> func is called with the outputs of its dependencies
+## in the order they are listed. Dependencies must be added first , so the graph is always acyclic.
+## run submits every node whose dependencies are done to a thread pool (or a process pool
+## with use_processes=True , then func and its inputs must be picklable) and returns
+## {node name: output}. timings_ keeps start / end / duration / worker for every node.
+class DAGExecutor:
+    def __init__(self,max_workers=None,use_processes=False):
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.nodes = {}
+        self.timings_ = {}
+
+    def add_node(self,name:str,func,depends_on=()):
+        if name in self.nodes:
+            raise ValueError(f"Node {name} is already in the graph.")
+        missing = [dependency for dependency in depends_on if dependency not in self.nodes]
+        if missing:
+            raise ValueError(f"Node {name} depends on unknown nodes {missing}.")
+        self.nodes[name] = (func,list(depends_on))
+        return self
+
+    def run(self) -> dict:
+        remaining = {name: len(depends_on) for name,(_,depends_on) in self.nodes.items()}
+        children = {name: [] for name in self.nodes}
+        for name,(_,depends_on) in self.nodes.items():
+            for dependency in depends_on:
+                children[dependency].append(name)
+
+        outputs = {}
+        self.timings_ = {}
+        pool_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        run_start = time.time()
+        logging.info(f"Running {len(self.nodes)} pipeline steps on a {pool_class.__name__}.")
+        with pool_class(max_workers=self.max_workers) as pool:
+            running = {}
+
+            def submit(name):
+                func,depends_on = self.nodes[name]
+                args = [outputs[dependency] for dependency in depends_on]
+                running[pool.submit(_timed_call,func,args)] = name
+
+            for name,count in remaining.items():
+                if count == 0:
+                    submit(name)
+            while running:
+                done,_ = wait(running,return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result,start,end,worker = future.result()
+                    except Exception:
+                        for pending in running:
+                            pending.cancel()
+                        logging.error(f"Step {name} failed.")
+                        raise
+                    outputs[name] = result
+                    self.timings_[name] = {
+                        "start": start - run_start,
+                        "end": end - run_start,
+                        "duration": end - start,
+                        "worker": worker,
+                    }
+                    logging.info(f"Step {name} finished in {end - start:.3f}s.")
+                    for child in children[name]:
+                        remaining[child] -= 1
+                        if remaining[child] == 0:
+                            submit(child)
+
+        wall_time = time.time() - run_start
+        busy_time = sum(timing["duration"] for timing in self.timings_.values())
+        logging.info(f"Pipeline finished in {wall_time:.3f}s wall time for {busy_time:.3f}s of step time.")
+        return outputs
@@ -0,0 +1,135 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import types
+import joblib
+import numpy as np
+
+logging.basicConfig(level=logging.INFO,format="%(asctime)s - %(levelname)s - %(message)s",force=True)
+
+
+## Output of a pipeline step together with its cache key
+class StepOutput:
+    def __init__(self,value,key:str):
+        self.value = value
+        self.key = key
+
+
+## Hash of the bytecode of a function , nested functions and lambdas included. Constants are
+## part of it so changing a literal in the step changes the key as well.
+def _code_hash(code:types.CodeType) -> str:
+    digest = hashlib.sha256(code.co_code)
+    for const in code.co_consts:
+        digest.update((_code_hash(const) if isinstance(const,types.CodeType) else repr(const)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+## Functions are described by where they live and what they do , classes by the code of their
+## methods , so editing a step or a strategy invalidates its cached outputs.
+def _describe_callable(value):
+    if isinstance(value,functools.partial):
+        return {"partial": _describe_callable(value.func),"args": list(value.args),"keywords": value.keywords}
+    if isinstance(value,types.MethodType):
+        return {"method": _describe_callable(value.__func__),"self": value.__self__}
+    name = f"{getattr(value,'__module__',None)}.{getattr(value,'__qualname__',repr(value))}"
+    if isinstance(value,type):
+        methods = {f"{cls.__qualname__}.{key}": _code_hash(item.__code__) for cls in value.__mro__[:-1]
+                   for key,item in vars(cls).items() if hasattr(item,"__code__")}
+        return {"class": name,"methods": methods}
+    code = getattr(value,"__code__",None)
+    return {"function": name,"code": None if code is None else _code_hash(code)}
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _project_module(name:str):
+    module = sys.modules.get(name)
+    path = os.path.abspath(getattr(module,"__file__",None) or "")
+    if path.startswith(PROJECT_ROOT + os.sep) and "site-packages" not in path:
+        return module
+    return None
+
+
+## Hash of the source files of the project modules a step depends on : the module defining the
+## step and every project module reachable from it through imports. The steps build their
+## strategies from strings (e.g. "mean") , so editing a strategy in src/ must change the key too.
+def _source_hash(func) -> str:
+    func = getattr(func,"func",func)
+    pending = [getattr(func,"__module__",None)]
+    seen = {}
+    while pending:
+        name = pending.pop()
+        module = None if name is None or name in seen else _project_module(name)
+        if module is None:
+            continue
+        with open(module.__file__,"rb") as source:
+            seen[name] = hashlib.sha256(source.read()).hexdigest()
+        for item in vars(module).values():
+            pending.append(item.__name__ if isinstance(item,types.ModuleType) else getattr(item,"__module__",None))
+    return hashlib.sha256(json.dumps(seen,sort_keys=True).encode("utf-8")).hexdigest()
+
+
+## Strategy objects and other parameters are described by their type and attributes so that
+## two equal configurations give the same key. Fitted state (attributes ending with "_") is left out.
+def _describe(value):
+    if isinstance(value,np.ndarray):
+        return value.tolist()
+    if isinstance(value,np.generic):
+        return value.item()
+    if isinstance(value,(type,functools.partial,types.FunctionType,types.MethodType,types.BuiltinFunctionType)):
+        return _describe_callable(value)
+    if hasattr(value,"__dict__"):
+        return {"type": _describe_callable(type(value)),**{key: item for key,item in vars(value).items() if not key.endswith("_")}}
+    return repr(value)
+
+
+## Content addressed cache for the training pipeline steps.
+## The key of a step is the hash of its function , the source of the project modules it imports ,
+## its parameters and the keys of its inputs , so the frames themselves are never hashed again.
+## The step name only labels the log lines , two steps running the same function on the same
+## inputs share one entry. The key of the raw data is the hash of the source file. Changing a
+## parameter or the code of a step only invalidates that step and the ones after it. Code outside
+## the project (pandas , sklearn upgrades) is not part of the key , delete cache_dir after those.
+class StepCache:
+    def __init__(self,cache_dir="step_cache",enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+
+    @staticmethod
+    def make_key(func,params:dict,input_keys:list) -> str:
+        payload = json.dumps([_describe_callable(func),_source_hash(func),params,input_keys],sort_keys=True,default=_describe)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self,func,key:str) -> str:
+        name = getattr(getattr(func,"func",func),"__name__","step")
+        return os.path.join(self.cache_dir,f"{name}-{key[:16]}.joblib")
+
+    def run(self,step_name:str,func,params:dict=None,inputs:list=None) -> StepOutput:
+        params = params or {}
+        inputs = inputs or []
+        key = self.make_key(func,params,[step_input.key for step_input in inputs])
+        path = self._path(func,key)
+        if self.enabled and os.path.exists(path):
+            logging.info(f"Step {step_name}: using cached output {path}")
+            return StepOutput(joblib.load(path),key)
+
+        logging.info(f"Step {step_name}: running.")
+        value = func(*[step_input.value for step_input in inputs],**params)
+        if self.enabled:
+            os.makedirs(self.cache_dir,exist_ok=True)
+            ## write to a temp file of its own first , so an interrupted run never leaves a broken
+            ## cache entry and steps writing the same key at the same time do not collide
+            fd,tmp_path = tempfile.mkstemp(dir=self.cache_dir,prefix=os.path.basename(path) + ".",suffix=".tmp")
+            os.close(fd)
+            try:
+                joblib.dump(value,tmp_path)
+                os.replace(tmp_path,path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        return StepOutput(value,key)
@@ -1,6 +1,77 @@
-## ZenML is tool that helps you organize your machine learning 
+## ZenML is tool that helps you organize your machine learning
 ## work properly like a real system instead of a notebook.
 
 ## MLFlow is a tool that remembers everything you try im ML.
-## It tracks ML experiments parameters metrics and models unlike 
-## traditional notebook approach 
+## It tracks ML experiments parameters metrics and models unlike
+## traditional notebook approach
+
+## The pipeline below is a graph of steps run by pipelines/dag_executor.py , steps that do not
+## depend on each other (e.g. several model strategies and their evaluations) run in parallel.
+## The output of every step is cached under a hash of its inputs and parameters
+## (see pipelines/step_cache.py) so changing only the model strategies re-runs only model
+## building and evaluation.
+## Run from the project root : python -m pipelines.training_pipeline
+
+import logging
+from functools import partial
+from pipelines.dag_executor import DAGExecutor
+from pipelines.step_cache import StepCache, StepOutput
+from src.ingest_data import CachedDataIngestor
+from steps.data_ingestion_step import data_ingestion_step
+from steps.handle_missing_values_step import handle_missing_values_step
+from steps.outlier_detection_step import outlier_detection_step
+from steps.feature_engineering_step import feature_engineering_step
+from steps.data_splitter_step import data_splitter_step
+from steps.model_building_step import model_building_step
+from steps.model_evaluater_step import model_evaluator_step
+
+
+## The splitter returns (X_train , X_test , y_train , y_test) as one cached output
+def _train_on_split(split,strategy=None):
+    X_train,_,y_train,_ = split
+    return model_building_step(X_train,y_train,strategy=strategy)
+
+def _evaluate_on_split(trained_model,split):
+    _,X_test,_,y_test = split
+    return model_evaluator_step(trained_model,X_test,y_test)
+
+## Graph node that runs a step through the cache , the dependencies' StepOutputs are its inputs
+def _cached_step(cache:StepCache,step_name:str,func,params:dict,*inputs) -> StepOutput:
+    return cache.run(step_name,func,params,list(inputs))
+
+
+## model_strategies -> list of ModelBuildingStrategy objects trained and evaluated in parallel ,
+##                     None trains the default linear regression
+## Returns the trained models and their metrics in the order of model_strategies
+## and the executor so the per step timings (executor.timings_) can be inspected.
+def training_pipeline(file_path="data/archive.zip",model_strategies:list=None,target_column="SalePrice",
+                      cache_dir="step_cache",use_cache=True,max_workers=None):
+    cache = StepCache(cache_dir=cache_dir,enabled=use_cache)
+    model_strategies = model_strategies or [None]
+    executor = DAGExecutor(max_workers=max_workers)
+
+    def add_step(name,func,params=None,depends_on=()):
+        executor.add_node(name,partial(_cached_step,cache,name,func,params or {}),depends_on)
+
+    ## The raw data is keyed by the content of the source file
+    source = StepOutput(file_path,CachedDataIngestor.file_hash(file_path))
+    executor.add_node("source",lambda: source)
+    add_step("data_ingestion",data_ingestion_step,depends_on=["source"])
+    add_step("handle_missing_values",handle_missing_values_step,{"strategy": "mean"},["data_ingestion"])
+    add_step("outlier_detection",outlier_detection_step,{"columns": [target_column]},["handle_missing_values"])
+    add_step("feature_engineering",feature_engineering_step,{"strategy": "onehot_encoding"},["outlier_detection"])
+    add_step("data_splitter",data_splitter_step,{"target_column": target_column},["feature_engineering"])
+    for i,strategy in enumerate(model_strategies):
+        add_step(f"model_building_{i}",_train_on_split,{"strategy": strategy},["data_splitter"])
+        add_step(f"model_evaluation_{i}",_evaluate_on_split,depends_on=[f"model_building_{i}","data_splitter"])
+
+    outputs = executor.run()
+    models = [outputs[f"model_building_{i}"].value for i in range(len(model_strategies))]
+    metrics = [outputs[f"model_evaluation_{i}"].value for i in range(len(model_strategies))]
+    for strategy,model_metrics in zip(model_strategies,metrics):
+        logging.info(f"{strategy or 'Default strategy'}: {model_metrics}")
+    return models,metrics,executor
+
+
+if __name__ == "__main__":
+    training_pipeline()
@@ -1,7 +1,10 @@
 import logging 
 from abc import ABC , abstractmethod
+from typing import Iterator
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split,KFold,GroupKFold,TimeSeriesSplit
+from src.instrumentation import instrument
 
 logging.basicConfig(level = logging.INFO,format="%(asctime)s - %(levelname)s - %(message)s",force=True)
 
@@ -27,6 +30,74 @@ class SimpleTrainTestSplit(DataSplittingStrategy):
         return X_train,X_test,y_train,y_test
     
     
+
+## Base class for the cross validation strategies.
+## split_indices yields (train_positions , test_positions) numpy arrays for every fold ,
+## nothing is copied so many folds cost no more memory than the frame itself.
+## The folds can be passed as cv= to sklearn or used with df.iloc one fold at a time.
+## split_data keeps the DataDSplitter contract and materializes only the first fold.
+class FoldSplittingStrategy(DataSplittingStrategy):
+    @abstractmethod
+    def split_indices(self,df:pd.DataFrame) -> Iterator[tuple]:
+        pass
+
+    def split_data(self,df:pd.DataFrame,target_column:str):
+        train_idx,test_idx = next(iter(self.split_indices(df)))
+        features = df.columns.drop(target_column)
+        X_train,X_test = df.iloc[train_idx][features],df.iloc[test_idx][features]
+        y_train,y_test = df[target_column].iloc[train_idx],df[target_column].iloc[test_idx]
+        return X_train,X_test,y_train,y_test
+
+
+## Plain K fold , every row is in the test fold exactly once
+class KFoldSplit(FoldSplittingStrategy):
+    def __init__(self,n_splits=5,shuffle=True,random_state=42):
+        self.n_splits = n_splits
+        self.shuffle = shuffle
+        self.random_state = random_state
+
+    def split_indices(self,df:pd.DataFrame) -> Iterator[tuple]:
+        logging.info(f"Performing {self.n_splits} fold split.")
+        random_state = self.random_state if self.shuffle else None
+        kfold = KFold(n_splits=self.n_splits,shuffle=self.shuffle,random_state=random_state)
+        yield from kfold.split(np.empty(len(df)))
+
+
+## Grouped K fold , all the rows of one group (e.g. one Neighborhood) land in the same fold
+## so the model is always tested on groups it has not seen.
+class GroupKFoldSplit(FoldSplittingStrategy):
+    def __init__(self,group_column="Neighborhood",n_splits=5):
+        self.group_column = group_column
+        self.n_splits = n_splits
+
+    def split_indices(self,df:pd.DataFrame) -> Iterator[tuple]:
+        logging.info(f"Performing {self.n_splits} fold split grouped by {self.group_column}.")
+        groups,_ = pd.factorize(df[self.group_column])
+        yield from GroupKFold(n_splits=self.n_splits).split(np.empty(len(df)),groups=groups)
+
+
+## Time ordered split , rows are ordered by sale period (year , month) and every fold trains
+## on the earlier periods and tests on the following ones. Sales of the same month are never
+## split between train and test.
+class TimeOrderedSplit(FoldSplittingStrategy):
+    def __init__(self,n_splits=5,year_column="Yr Sold",month_column="Mo Sold"):
+        self.n_splits = n_splits
+        self.year_column = year_column
+        self.month_column = month_column
+
+    def split_indices(self,df:pd.DataFrame) -> Iterator[tuple]:
+        logging.info(f"Performing {self.n_splits} time ordered splits on {self.year_column}/{self.month_column}.")
+        periods = df[self.year_column].to_numpy(dtype=np.int64) * 12 + df[self.month_column].to_numpy(dtype=np.int64)
+        unique_periods,period_codes = np.unique(periods,return_inverse=True)
+        ## order the rows once by period , each fold is then a prefix and a following slice of it
+        order = np.argsort(period_codes,kind="stable")
+        boundaries = np.searchsorted(period_codes[order],np.arange(len(unique_periods) + 1))
+        for train_periods,test_periods in TimeSeriesSplit(n_splits=self.n_splits).split(unique_periods):
+            train_end = boundaries[train_periods[-1] + 1]
+            test_start,test_end = boundaries[test_periods[0]],boundaries[test_periods[-1] + 1]
+            yield order[:train_end],order[test_start:test_end]
+    
+    
 class DataDSplitter:
     def __init__(self,strategy:DataSplittingStrategy):
         self.strategy = strategy
@@ -35,11 +106,24 @@ class DataDSplitter:
         logging.info("Switching data splitting strategy.")
         self.strategy =strategy
         
+    @instrument
     def split(self,df:pd.DataFrame,target_column:str):
         logging.info("Splitting the Data.")
         return self.strategy.split_data(df,target_column)
 
+    @instrument
+    def split_indices(self,df:pd.DataFrame):
+        if not isinstance(self.strategy,FoldSplittingStrategy):
+            raise TypeError("The selected strategy does not produce index based folds.")
+        logging.info("Generating index based folds.")
+        return self.strategy.split_indices(df)
+
 if __name__ == "__main__":
     df = pd .read_csv("C:/Users/Naitik/OneDrive/ドキュメント/Projects/End_to_End_Price_Prediction/src/extracted_data/AmesHousing.csv")
     data_splitter = DataDSplitter(SimpleTrainTestSplit(test_size=0.25,random_state=42))
-    X_train,X_test,y_train,y_test = data_splitter.split(df,target_column="SalePrice")
\ No newline at end of file
+    X_train,X_test,y_train,y_test = data_splitter.split(df,target_column="SalePrice")
+
+    ## Index based folds , no copy of the frame is made per fold
+    data_splitter.set_strategy(GroupKFoldSplit(group_column="Neighborhood",n_splits=5))
+    for train_idx,test_idx in data_splitter.split_indices(df):
+        print(len(train_idx),len(test_idx))
@@ -0,0 +1,102 @@
+from abc import ABC , abstractmethod
+import json
+import logging
+import numpy as np
+import pandas as pd
+from src.instrumentation import instrument
+
+logging.basicConfig(level=logging.INFO,format="%(asctime)s - %(levelname)s - %(message)s",force=True)
+
+
+## Abstract class for the dtype optimization strategies
+## Each strategy takes the freshly ingested frame and returns it with smaller dtypes
+class DtypeOptimizationStrategy(ABC):
+    @abstractmethod
+    def optimize(self,df:pd.DataFrame) -> pd.DataFrame:
+        pass
+
+
+## Infer the smallest safe dtype for every column.
+## integers -> smallest int/uint width that holds the min and max
+## floats -> float32 only when every value survives the round trip unchanged
+## strings -> category when the share of unique values is at most max_category_ratio
+## code_columns -> numeric codes like "MS SubClass" that are really categories
+## id_columns -> identifiers like "PID" , only downcast and never turned into category
+class InferredDtypeOptimization(DtypeOptimizationStrategy):
+    def __init__(self,max_category_ratio=0.5,code_columns=("MS SubClass",),id_columns=("Order","PID")):
+        self.max_category_ratio = max_category_ratio
+        self.code_columns = list(code_columns)
+        self.id_columns = list(id_columns)
+
+    def optimize(self,df:pd.DataFrame) -> pd.DataFrame:
+        logging.info("Inferring optimized dtypes.")
+        df_optimized = df.copy()
+        for column in df_optimized.columns:
+            series = df_optimized[column]
+            if column in self.code_columns:
+                df_optimized[column] = series.astype("category")
+            elif pd.api.types.is_integer_dtype(series):
+                downcast = "unsigned" if series.min() >= 0 else "integer"
+                df_optimized[column] = pd.to_numeric(series,downcast=downcast)
+            elif pd.api.types.is_float_dtype(series):
+                downcast = series.astype(np.float32)
+                if np.array_equal(downcast.to_numpy(dtype=np.float64),series.to_numpy(),equal_nan=True):
+                    df_optimized[column] = downcast
+            elif column not in self.id_columns and (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+                if len(series) and series.nunique() / len(series) <= self.max_category_ratio:
+                    df_optimized[column] = series.astype("category")
+        logging.info("Dtype inference completed.")
+        return df_optimized
+
+
+## Skip inference and cast to the dtypes declared in a json schema file {"column": "dtype"}
+## Columns missing from the schema are left as they are.
+class SchemaDtypeOptimization(DtypeOptimizationStrategy):
+    def __init__(self,schema_path:str):
+        self.schema_path = schema_path
+
+    def optimize(self,df:pd.DataFrame) -> pd.DataFrame:
+        logging.info(f"Applying declared schema from {self.schema_path}")
+        with open(self.schema_path) as f:
+            schema = json.load(f)
+        schema = {column: dtype for column,dtype in schema.items() if column in df.columns}
+        df_optimized = df.astype(schema)
+        logging.info("Declared schema applied.")
+        return df_optimized
+
+
+class DtypeOptimizer:
+    def __init__(self,strategy:DtypeOptimizationStrategy):
+        self.strategy = strategy
+
+    def set_strategy(self,strategy:DtypeOptimizationStrategy):
+        logging.info("Switching dtype optimization strategy.")
+        self.strategy = strategy
+
+    @instrument
+    def optimize(self,df:pd.DataFrame) -> pd.DataFrame:
+        before = df.memory_usage(deep=True).sum()
+        df_optimized = self.strategy.optimize(df)
+        after = df_optimized.memory_usage(deep=True).sum()
+        logging.info(f"Memory usage reduced from {before / 1024**2:.2f} MB to {after / 1024**2:.2f} MB "
+                     f"({before / max(after,1):.1f}x smaller).")
+        return df_optimized
+
+    ## Write the dtypes of an optimized frame so later runs can use SchemaDtypeOptimization
+    @staticmethod
+    def save_schema(df:pd.DataFrame,schema_path:str):
+        schema = {column: str(dtype) for column,dtype in df.dtypes.items()}
+        with open(schema_path,"w") as f:
+            json.dump(schema,f,indent=2)
+        logging.info(f"Schema saved to {schema_path}")
+
+
+if __name__ == "__main__":
+    df = pd.read_csv("C:/Users/Naitik/OneDrive/ドキュメント/Projects/End_to_End_Price_Prediction/extracted_data/AmesHousing.csv")
+    ## Infer the dtypes on the first run and keep the schema
+    dtype_optimizer = DtypeOptimizer(InferredDtypeOptimization())
+    df_optimized = dtype_optimizer.optimize(df)
+    dtype_optimizer.save_schema(df_optimized,"ames_schema.json")
+    ## Later runs can skip the inference
+    dtype_optimizer.set_strategy(SchemaDtypeOptimization("ames_schema.json"))
+    df_optimized = dtype_optimizer.optimize(df)
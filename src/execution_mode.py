@@ -0,0 +1,47 @@
+import contextlib
+import functools
+import logging
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO,format="%(asctime)s - %(levelname)s - %(message)s",force=True)
+
+
+## How the preprocessing context classes treat the frame they are given.
+## copy    -> every step returns a new frame and the input is left as it was (the old behaviour)
+## cow     -> copy on write : the step works on a shallow copy , only the columns it rewrites get
+##            new memory and the input is still left as it was
+## inplace -> the step writes straight into the given frame , nothing is copied but the caller's
+##            frame is changed
+EXECUTION_MODES = ("copy","cow","inplace")
+
+
+def check_execution_mode(execution_mode:str) -> str:
+    if execution_mode not in EXECUTION_MODES:
+        raise ValueError(f"Unknown execution mode {execution_mode}. Use one of {EXECUTION_MODES}")
+    return execution_mode
+
+
+## pandas 3 always copies on write , older versions get the (process wide) option only for the
+## duration of a cow stage and it is restored afterwards , so code outside the stage keeps its semantics
+def copy_on_write(execution_mode:str):
+    if execution_mode == "cow" and int(pd.__version__.split(".")[0]) < 3:
+        return pd.option_context("mode.copy_on_write",True)
+    return contextlib.nullcontext()
+
+
+## Decorator for the context class methods that call working_frame
+def execution_scope(func):
+    @functools.wraps(func)
+    def wrapper(self,*args,**kwargs):
+        with copy_on_write(self.execution_mode):
+            return func(self,*args,**kwargs)
+    return wrapper
+
+
+## The frame a step should write into , None means the step runs in its old copying way
+def working_frame(df:pd.DataFrame,execution_mode:str):
+    if execution_mode == "cow":
+        return df.copy(deep=False)
+    if execution_mode == "inplace":
+        return df
+    return None
@@ -2,29 +2,153 @@ from abc import ABC ,abstractmethod
 import logging
 import pandas as pd
 import numpy as np 
-from sklearn.preprocessing import StandardScaler,OneHotEncoder,MinMaxScaler
+import joblib
+import scipy.sparse as sp
+from sklearn.preprocessing import StandardScaler,OneHotEncoder,MinMaxScaler,PowerTransformer
+from sklearn.feature_extraction import FeatureHasher
+from src.execution_mode import check_execution_mode, execution_scope, working_frame
+from src.instrumentation import instrument
 
 logging.basicConfig(level=logging.INFO, format =" %(asctime)s - %(levelname)s - %(message)s ",force=True )
 
-## Abstract class for implementation of apply_transformation function
+## scipy sparse matrix -> frame of Sparse[float64, 0] columns. DataFrame.sparse.from_spmatrix
+## uses NaN as the fill value on newer pandas , which would turn every implicit zero into a missing value.
+def _sparse_frame(matrix,index,columns) -> pd.DataFrame:
+    matrix = sp.csc_matrix(matrix,dtype=np.float64)
+    arrays = {column: pd.arrays.SparseArray.from_spmatrix(matrix[:,[j]]) for j,column in enumerate(columns)}
+    return pd.DataFrame(arrays,index=index)
+
+
+## Swap the encoded features for their encoded columns. Inplace the given frame itself ends up
+## fully encoded (drop and the new columns both go into it) , otherwise a new frame is built
+## and drop never copies the untouched columns.
+def _replace_columns(df:pd.DataFrame,features:list,encoded_df:pd.DataFrame,inplace:bool) -> pd.DataFrame:
+    if not inplace:
+        return pd.concat([df.drop(columns=features),encoded_df],axis=1)
+    df.drop(columns=features,inplace=True)
+    df[list(encoded_df.columns)] = encoded_df
+    return df
+
+
+## Abstract class for the feature engineering strategies
+## fit -> learn the statistics (mean , min/max , categories ...) from the training frame
+## transform -> apply the learned statistics , inplace=True writes into the given frame instead of copying it
+## apply_transformation -> fit and transform in one go (the original behaviour)
+## fit_transform -> the same with the inplace option
 class FeatureEngineeringStrategy(ABC):
+    def fit(self,df:pd.DataFrame):
+        return self
+
     @abstractmethod
-    def apply_transformation(self,df:pd.DataFrame) -> pd.DataFrame:
+    def transform(self,df:pd.DataFrame,inplace=False) -> pd.DataFrame:
         pass
 
+    def fit_transform(self,df:pd.DataFrame,inplace=False) -> pd.DataFrame:
+        return self.fit(df).transform(df,inplace=inplace)
+
+    def apply_transformation(self,df:pd.DataFrame) -> pd.DataFrame:
+        return self.fit(df).transform(df)
+
+
+## Power transformations reduce skewness and compress large values.
+## method -> "log1p" (log(1 + x)) , "box-cox" (x > 0) or "yeo-johnson" (any x)
+## fit learns one lambda per feature for box-cox / yeo-johnson (nothing to learn for log1p).
+## All the features are transformed together as one 2D float block , and inverse_transform /
+## inverse_transform_values map values back , e.g. SalePrice predictions of a model trained
+## on the transformed target.
+class PowerTransformation(FeatureEngineeringStrategy):
+    def __init__(self,features,method="log1p"):
+        if method not in ("log1p","box-cox","yeo-johnson"):
+            raise ValueError(f"Unknown power transformation method {method}.")
+        self.features = list(features)
+        self.method = method
+        self.lambdas_ = None
+
+    def _check_domain(self,block:np.ndarray,features:list):
+        if self.method == "log1p":
+            invalid = (block <= -1).any(axis=0)
+            rule = "greater than -1"
+        elif self.method == "box-cox":
+            invalid = (block <= 0).any(axis=0)
+            rule = "strictly positive"
+        else:
+            return
+        if invalid.any():
+            bad = [feature for feature,flag in zip(features,invalid) if flag]
+            raise ValueError(f"{self.method} needs values {rule} , found invalid values in {bad}.")
+
+    def _lambdas(self,features:list) -> np.ndarray:
+        if self.method == "log1p":
+            return np.zeros(len(features))
+        if self.lambdas_ is None:
+            raise ValueError("PowerTransformation must be fitted before transform.")
+        return np.array([self.lambdas_[feature] for feature in features])
+
+    def fit(self,df:pd.DataFrame):
+        if self.method == "log1p":
+            return self
+        block = df[self.features].to_numpy(dtype=np.float64)
+        self._check_domain(block,self.features)
+        transformer = PowerTransformer(method=self.method,standardize=False).fit(block)
+        self.lambdas_ = dict(zip(self.features,transformer.lambdas_))
+        return self
+
+    def forward(self,block:np.ndarray,features:list) -> np.ndarray:
+        self._check_domain(block,features)
+        if self.method == "log1p":
+            return np.log1p(block,out=block)
+        lambdas = self._lambdas(features)
+        with np.errstate(divide="ignore",invalid="ignore"):
+            if self.method == "box-cox":
+                return np.where(lambdas == 0,np.log(block),(block ** lambdas - 1) / lambdas)
+            positive = block >= 0
+            two = 2 - lambdas
+            return np.where(
+                positive,
+                np.where(lambdas == 0,np.log1p(np.abs(block)),((np.abs(block) + 1) ** lambdas - 1) / lambdas),
+                np.where(two == 0,-np.log1p(np.abs(block)),-((np.abs(block) + 1) ** two - 1) / two),
+            )
+
+    def inverse(self,block:np.ndarray,features:list) -> np.ndarray:
+        if self.method == "log1p":
+            return np.expm1(block,out=block)
+        lambdas = self._lambdas(features)
+        with np.errstate(divide="ignore",invalid="ignore",over="ignore"):
+            if self.method == "box-cox":
+                return np.where(lambdas == 0,np.exp(block),(lambdas * block + 1) ** (1 / lambdas))
+            positive = block >= 0
+            two = 2 - lambdas
+            return np.where(
+                positive,
+                np.where(lambdas == 0,np.expm1(block),(np.abs(lambdas * block + 1)) ** (1 / lambdas) - 1),
+                np.where(two == 0,-np.expm1(-block),1 - np.abs(-two * block + 1) ** (1 / two)),
+            )
+
+    def transform(self, df:pd.DataFrame,inplace=False)-> pd.DataFrame:
+        logging.info(f"Applying {self.method} transformation to features : {self.features}")
+        df_transformed = df if inplace else df.copy(deep=False)
+        block = df[self.features].to_numpy(dtype=np.float64,copy=True)
+        df_transformed[self.features] = self.forward(block,self.features)
+        logging.info(f"{self.method} transformation completed.")
+        return df_transformed
+
+    def inverse_transform(self,df:pd.DataFrame,inplace=False) -> pd.DataFrame:
+        df_restored = df if inplace else df.copy(deep=False)
+        block = df[self.features].to_numpy(dtype=np.float64,copy=True)
+        df_restored[self.features] = self.inverse(block,self.features)
+        return df_restored
+
+    ## Map an array of values of one feature back , e.g. model predictions of the log target
+    def inverse_transform_values(self,values,feature:str) -> np.ndarray:
+        block = np.array(values,dtype=np.float64).reshape(-1,1)
+        return self.inverse(block,[feature]).ravel()
+
 
 ## Lof transformation is a feature engineering technique used to 
 ## reduce skewness and compress large values by applying a log function.
-class LogTransformation(FeatureEngineeringStrategy):
+class LogTransformation(PowerTransformation):
     def __init__(self,features):
-        self.features = features
-    def apply_transformation(self, df:pd.DataFrame)-> pd.DataFrame:
-        logging.info(f"Applying log transformation to features : {self.features}")
-        df_transformed = df.copy()
-        for feature in self.features:
-            df_transformed["feature"] = np.log1p(df[feature])
-        logging.info("Log transformation completed.")
-        return df_transformed
+        super().__init__(features,method="log1p")
     
 ## Standard scaler is a feature scaling technique that standardizes 
 ## numerical data so that mean = 0 and S.D. = 1.
@@ -32,11 +156,15 @@ class StandardScaling(FeatureEngineeringStrategy):
     def __init__(self,features):
         self.features =features
         self.scaler = StandardScaler()
+
+    def fit(self,df:pd.DataFrame):
+        self.scaler.fit(df[self.features])
+        return self
     
-    def apply_transformation(self, df:pd.DataFrame)->pd.DataFrame:
+    def transform(self, df:pd.DataFrame,inplace=False)->pd.DataFrame:
         logging.info(f"Applying standard scaling to features:{self.features}")
-        df_transformed = df.copy()
-        df_transformed[self.features] = self.scaler.fit_transform(df[self.features])
+        df_transformed = df if inplace else df.copy()
+        df_transformed[self.features] = self.scaler.transform(df[self.features])
         logging.info("Standard Scaling Completed.")
         return df_transformed
     
@@ -46,42 +174,150 @@ class MinMaxScaling(FeatureEngineeringStrategy):
     def __init__(self,features,feature_range=(0,1)):
         self.features = features
         self.scaler = MinMaxScaler(feature_range=feature_range)
+
+    def fit(self,df:pd.DataFrame):
+        self.scaler.fit(df[self.features])
+        return self
     
-    def apply_transformation(self, df:pd.DataFrame)-> pd.DataFrame:
+    def transform(self, df:pd.DataFrame,inplace=False)-> pd.DataFrame:
         logging.info(f"Applying Min - Max scaling to features :{self.features}")
-        df_transformed = df.copy()
-        df_transformed[self.features]=self.scaler.fit_transform(df[self.features])
+        df_transformed = df if inplace else df.copy()
+        df_transformed[self.features]=self.scaler.transform(df[self.features])
         logging.info("Min - Max scaling completed.")
         return df_transformed
     
 ## This strategy applies one hot encoding to categorical features,converting them into binary vectors.
+## Categories not seen while fitting are encoded as all zeros.
+## sparse=True keeps the encoded block as pandas sparse columns so it reaches the model as a
+## scipy sparse matrix instead of thousands of dense float64 columns.
+## max_categories caps the categories kept per feature , the rest go to an "infrequent" (other) bucket.
 class OneHotEncoding(FeatureEngineeringStrategy):
-    def __init__(self,features):
+    def __init__(self,features,sparse=False,max_categories=None):
         self.features = features
-        self.encoder = OneHotEncoder(sparse=False,drop="first")
+        self.sparse = sparse
+        self.encoder = OneHotEncoder(
+            sparse_output=sparse,
+            drop="first",
+            handle_unknown="infrequent_if_exist",
+            max_categories=max_categories,
+        )
+
+    def fit(self,df:pd.DataFrame):
+        self.encoder.fit(df[self.features])
+        return self
         
-    def apply_transformation(self, df:pd.DataFrame)-> pd.DataFrame:
+    def transform(self, df:pd.DataFrame,inplace=False)-> pd.DataFrame:
         logging.info(f"Applying one hot encoding to features:{self.features}")
-        df_transformed = df.copy()
-        encoded_df = pd.DataFrame(
-            self.encoder.fit_transform(df[self.features]),
-            columns=self.encoder.get_feature_names_out(self.features),
-        )
-        df_transformed=df_transformed.drop(columns=self.features)
-        df_transformed = pd.concat([df_transformed,encoded_df],axis =1)
+        encoded = self.encoder.transform(df[self.features])
+        columns = self.encoder.get_feature_names_out(self.features)
+        if self.sparse:
+            encoded_df = _sparse_frame(encoded,df.index,columns)
+        else:
+            encoded_df = pd.DataFrame(encoded,columns=columns,index=df.index)
+        df_transformed = _replace_columns(df,self.features,encoded_df,inplace)
         logging.info("One hot encoding Completed.")
         return df_transformed
+
+
+## The hashing trick maps every "feature=value" pair into one of n_features columns.
+## The output width is fixed whatever the number of categories (zip codes , street names ...)
+## and nothing has to be learned , so fit is a no-op.
+class HashingEncoding(FeatureEngineeringStrategy):
+    def __init__(self,features,n_features=2**10,sparse=True):
+        self.features = features
+        self.n_features = n_features
+        self.sparse = sparse
+        self.hasher = FeatureHasher(n_features=n_features,input_type="string",alternate_sign=False)
+
+    def transform(self, df:pd.DataFrame,inplace=False)-> pd.DataFrame:
+        logging.info(f"Applying hashing encoding to features:{self.features} with {self.n_features} columns")
+        tokens = np.column_stack([feature + "=" + df[feature].astype(str).to_numpy(dtype=object) for feature in self.features])
+        encoded = self.hasher.transform(tokens)
+        columns = [f"hash_{i}" for i in range(self.n_features)]
+        if self.sparse:
+            encoded_df = _sparse_frame(encoded,df.index,columns)
+        else:
+            encoded_df = pd.DataFrame(encoded.toarray(),columns=columns,index=df.index)
+        df_transformed = _replace_columns(df,self.features,encoded_df,inplace)
+        logging.info("Hashing encoding Completed.")
+        return df_transformed
+
+
+## A plan chains several strategies into one reusable preprocessing step.
+## fit learns every strategy in order on the training frame , transform then replays the
+## fitted strategies on new data. The input frame is shallow copied once and every strategy
+## works inplace on that copy so only the columns a strategy touches are rewritten.
+## The fitted plan can be saved with joblib and loaded back at scoring time.
+class FeatureEngineeringPlan(FeatureEngineeringStrategy):
+    def __init__(self,strategies:list):
+        self.strategies = list(strategies)
+        self.is_fitted = False
+
+    def fit(self,df:pd.DataFrame):
+        self.fit_transform(df)
+        return self
+
+    def fit_transform(self,df:pd.DataFrame,inplace=False) -> pd.DataFrame:
+        logging.info(f"Fitting feature engineering plan with {len(self.strategies)} steps.")
+        df_transformed = df if inplace else df.copy(deep=False)
+        for strategy in self.strategies:
+            df_transformed = strategy.fit(df_transformed).transform(df_transformed,inplace=True)
+        self.is_fitted = True
+        return df_transformed
+
+    def apply_transformation(self,df:pd.DataFrame) -> pd.DataFrame:
+        return self.fit_transform(df)
+
+    def transform(self,df:pd.DataFrame,inplace=False) -> pd.DataFrame:
+        if not self.is_fitted:
+            raise ValueError("The feature engineering plan must be fitted before transform.")
+        df_transformed = df if inplace else df.copy(deep=False)
+        for strategy in self.strategies:
+            df_transformed = strategy.transform(df_transformed,inplace=True)
+        return df_transformed
+
+    def save(self,path:str):
+        joblib.dump(self,path)
+        logging.info(f"Feature engineering plan saved to {path}")
+
+    @staticmethod
+    def load(path:str) -> "FeatureEngineeringPlan":
+        logging.info(f"Loading feature engineering plan from {path}")
+        return joblib.load(path)
+
         
+## execution_mode -> "copy" , "cow" or "inplace" (see src/execution_mode.py)
 class FeatureEngineer:
-    def __init__(self,strategy:FeatureEngineeringStrategy):
+    def __init__(self,strategy:FeatureEngineeringStrategy,execution_mode="copy"):
         self.strategy =strategy
+        self.execution_mode = check_execution_mode(execution_mode)
         
     def set_strategy(self,startegy:FeatureEngineeringStrategy):
         logging.info("Switching feature engineering startegy")
         self.strategy = startegy
+    @instrument
+    @execution_scope
     def apply_feature_engineering(self,df:pd.DataFrame)->pd.DataFrame:
         logging.info("Applying feature engineering startegy.")
-        return self.strategy.apply_transformation(df)
+        frame = working_frame(df,self.execution_mode)
+        if frame is None:
+            return self.strategy.apply_transformation(df)
+        return self.strategy.fit_transform(frame,inplace=True)
+
+    @instrument
+    def fit(self,df:pd.DataFrame):
+        logging.info("Fitting feature engineering startegy.")
+        self.strategy.fit(df)
+        return self
+
+    @instrument
+    @execution_scope
+    def transform(self,df:pd.DataFrame)->pd.DataFrame:
+        logging.info("Transforming with the fitted feature engineering startegy.")
+        frame = working_frame(df,self.execution_mode)
+        if frame is None:
+            return self.strategy.transform(df)
+        return self.strategy.transform(frame,inplace=True)
     
 if __name__ == "__main__":
     ##Load the dataframe
@@ -90,6 +326,11 @@ if __name__ == "__main__":
     log_transformer = FeatureEngineer(LogTransformation(features=['SalePrice', 'Gr Liv Area']))
     df_log_transformed = log_transformer.apply_feature_engineering(df)
 
+    # Yeo-Johnson Transformation with the inverse for the target
+    power_transformer = PowerTransformation(features=['SalePrice', 'Gr Liv Area'], method="yeo-johnson")
+    df_power_transformed = power_transformer.apply_transformation(df)
+    sale_price = power_transformer.inverse_transform_values(df_power_transformed['SalePrice'], 'SalePrice')
+
     #Standard Scaling Example
     standard_scaler = FeatureEngineer(StandardScaling(features=['SalePrice', 'Gr Liv Area']))
     df_standard_scaled = standard_scaler.apply_feature_engineering(df)
@@ -102,3 +343,19 @@ if __name__ == "__main__":
     onehot_encoder = FeatureEngineer(OneHotEncoding(features=['Neighborhood']))
     df_onehot_encoded = onehot_encoder.apply_feature_engineering(df)
 
+    # Sparse One-Hot Encoding with the rare categories grouped together
+    sparse_encoder = FeatureEngineer(OneHotEncoding(features=['Neighborhood', 'MS Zoning'], sparse=True, max_categories=10))
+    df_sparse_encoded = sparse_encoder.apply_feature_engineering(df)
+
+    # Hashing Encoding with a fixed output width
+    hashing_encoder = FeatureEngineer(HashingEncoding(features=['Neighborhood', 'Exterior 1st'], n_features=64))
+    df_hashed = hashing_encoder.apply_feature_engineering(df)
+
+    # Fit once and replay the fitted plan on new data
+    plan = FeatureEngineeringPlan([
+        StandardScaling(features=['Gr Liv Area']),
+        OneHotEncoding(features=['Neighborhood']),
+    ])
+    df_train_transformed = plan.fit_transform(df)
+    plan.save("feature_plan.joblib")
+    df_new_transformed = FeatureEngineeringPlan.load("feature_plan.joblib").transform(df.head(100))
@@ -1,17 +1,27 @@
 from abc import ABC , abstractmethod 
 import pandas as pd 
 import logging
+from src.execution_mode import check_execution_mode, execution_scope, working_frame
+from src.instrumentation import instrument
 
 ## logging is critical for Debugging Monitoring data changes Understanding pipeline behaviour
 logging.basicConfig(level=logging.INFO,format="%(asctime)s- %(levelname)s - %(message)s",force=True)
 
 
 ## This class will act as a abstract calss to implement method handle
+## fit/transform let a strategy learn from the training frame and replay on new data,
+## strategies without any state just run handle on transform.
 class MissingValueHandlingStrategy(ABC):
     @abstractmethod
     def handle(self,df:pd.DataFrame) -> pd.DataFrame:
         pass
 
+    def fit(self,df:pd.DataFrame):
+        return self
+
+    def transform(self,df:pd.DataFrame,inplace=False) -> pd.DataFrame:
+        return self.handle(df)
+
 
 ## Axis = 0 means we have to drop whole axis from the dataframe
 ## threshold_value = means for not-NA values Rows/Columns should be dropped
@@ -21,50 +31,112 @@ class DropMissingValuesStrategy(MissingValueHandlingStrategy):
         self.thresh = thresh
     
     def handle(self,df:pd.DataFrame)-> pd.DataFrame:
+        return self.transform(df)
+
+    def transform(self,df:pd.DataFrame,inplace=False) -> pd.DataFrame:
         logging.info(f"Dropping missing values with axis={self.axis} and threshold = {self.thresh}")
-        df_cleaned = df.dropna(axis = self.axis, thresh=self.thresh)
+        if inplace:
+            df.dropna(axis=self.axis,thresh=self.thresh,inplace=True)
+            df_cleaned = df
+        else:
+            df_cleaned = df.dropna(axis = self.axis, thresh=self.thresh)
         logging.info("Missing Values dropped.")
         return df_cleaned
     
 
 ## This is a class for which method u should handle missing values
+## method -> default method for every column : mean , median , mode or constant
+## column_methods -> per column override e.g. {"Lot Frontage": "median", "Alley": "constant"}
+## fit computes all the fill values in one vectorized call per method and keeps them in
+## fill_values_ , transform only fills from those so scoring uses the training statistics.
 class FillMissingValuesStrategy(MissingValueHandlingStrategy):
-    def __init__(self,method="mean",fill_value = None):
+    def __init__(self,method="mean",fill_value = None,column_methods=None):
         self.method = method
         self.fill_value = fill_value
-        
-    def handle(self,df:pd.DataFrame)-> pd.DataFrame:
-        logging.info(f"filling missing values using method :{self.method}")
-        df_cleaned = df.copy()
-        
-        if self.method == "mean":
-            numeric_columns = df_cleaned.select_dtypes(include="number").columns
-            df_cleaned[numeric_columns]=df_cleaned[numeric_columns].fillna(df[numeric_columns].mean())
-        elif self.method == "median":
-            numeric_columns = df_cleaned.select_dtypes(include="number").columns
-            df_cleaned[numeric_columns] = df_cleaned[numeric_columns].fillna(df[numeric_columns].median())
-        elif self.method == "mode":
-            for column in df_cleaned.columns:
-                df_cleaned[column].fillna(df[column].mode().iloc[0],inplace=True)
-        elif self.method ==  "constant":
-            df_cleaned=df_cleaned.fillna(self.fill_value)
+        self.column_methods = column_methods or {}
+        self.fill_values_ = None
+
+    def _columns_by_method(self,df:pd.DataFrame) -> dict:
+        numeric_columns = set(df.select_dtypes(include="number").columns)
+        columns_by_method = {}
+        for column in df.columns:
+            method = self.column_methods.get(column,self.method)
+            ## mean and median only make sense for numeric columns
+            if method in ("mean","median") and column not in numeric_columns:
+                continue
+            columns_by_method.setdefault(method,[]).append(column)
+        return columns_by_method
+
+    def fit(self,df:pd.DataFrame):
+        logging.info(f"Learning fill values using method :{self.method}")
+        fill_values = {}
+        for method,columns in self._columns_by_method(df).items():
+            if method == "mean":
+                values = df[columns].mean()
+            elif method == "median":
+                values = df[columns].median()
+            elif method == "mode":
+                values = df[columns].mode(dropna=True).iloc[0]
+            elif method == "constant":
+                values = pd.Series(self.fill_value,index=columns)
+            else:
+                logging.warning(f"Unknown method {method}. No missing values is handled for {columns}")
+                continue
+            fill_values.update(values.dropna().to_dict())
+        self.fill_values_ = fill_values
+        return self
+
+    def transform(self,df:pd.DataFrame,inplace=False) -> pd.DataFrame:
+        if self.fill_values_ is None:
+            raise ValueError("FillMissingValuesStrategy must be fitted before transform.")
+        ## only the columns that actually have missing values are touched
+        missing = df.columns[df.isna().any().to_numpy()]
+        fill_values = {column: self.fill_values_[column] for column in missing if column in self.fill_values_}
+        if inplace:
+            df.fillna(value=fill_values,inplace=True)
+            df_cleaned = df
         else:
-            logging.warning(f"Unknown method {self.method}. No missing values is handled ")
-        
+            df_cleaned = df.fillna(value=fill_values)
         logging.info("Missing values Filled.")
         return df_cleaned
+        
+    def handle(self,df:pd.DataFrame)-> pd.DataFrame:
+        logging.info(f"filling missing values using method :{self.method}")
+        return self.fit(df).transform(df)
 
+## execution_mode -> "copy" , "cow" or "inplace" (see src/execution_mode.py)
 class MissingValueHandler:
-    def __init__(self,strategy:MissingValueHandlingStrategy):
-        self.startegy = strategy
+    def __init__(self,strategy:MissingValueHandlingStrategy,execution_mode="copy"):
+        self.strategy = strategy
+        self.execution_mode = check_execution_mode(execution_mode)
         
     def set_strategy(self,strategy:MissingValueHandlingStrategy):
         self.strategy = strategy
         logging.info(f"Set Strategy to the {self.strategy}")
         
+    @instrument
+    @execution_scope
     def handle_missing_values(self,df:pd.DataFrame) -> pd.DataFrame:
         logging.info("Executing missing values handling startegy.")
-        return self.startegy.handle(df)
+        frame = working_frame(df,self.execution_mode)
+        if frame is None:
+            return self.strategy.handle(df)
+        return self.strategy.fit(frame).transform(frame,inplace=True)
+
+    @instrument
+    def fit(self,df:pd.DataFrame):
+        logging.info("Fitting missing values handling startegy.")
+        self.strategy.fit(df)
+        return self
+
+    @instrument
+    @execution_scope
+    def transform(self,df:pd.DataFrame) -> pd.DataFrame:
+        logging.info("Applying the fitted missing values handling startegy.")
+        frame = working_frame(df,self.execution_mode)
+        if frame is None:
+            return self.strategy.transform(df)
+        return self.strategy.transform(frame,inplace=True)
     
 if __name__ == "__main__":
     ## load the dataset 
@@ -75,5 +147,10 @@ if __name__ == "__main__":
     ##Switch the strategy
     missing_value_handler.set_strategy(FillMissingValuesStrategy(method="mean"))
     df_filled = missing_value_handler.handle_missing_values(df)
-    
-    
\ No newline at end of file
+    ## Learn the fill values once with a per column override and reuse them on new data
+    missing_value_handler.set_strategy(FillMissingValuesStrategy(method="mode",column_methods={"Lot Frontage": "median"}))
+    missing_value_handler.fit(df)
+    df_new_filled = missing_value_handler.transform(df.head(100))
+    ## Copy on write , only the filled columns get new memory and df is left untouched
+    cow_handler = MissingValueHandler(FillMissingValuesStrategy(method="mean"),execution_mode="cow")
+    df_filled = cow_handler.handle_missing_values(df)
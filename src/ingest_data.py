@@ -1,7 +1,20 @@
 from abc import ABC,abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+import logging
+import operator
+import re
+import numpy as np
 import pandas as pd
 import zipfile
+import hashlib
+import fnmatch
+import glob
+import json
 import os
+from src.instrumentation import instrument
+
+logging.basicConfig(level=logging.INFO,format="%(asctime)s - %(levelname)s - %(message)s",force=True)
 
 
 class DataIngestor(ABC):
@@ -10,6 +23,12 @@ class DataIngestor(ABC):
     def ingest(self,file_path:str) -> pd.DataFrame:
         pass
 
+    ## every ingestor's ingest is instrumented without having to decorate each subclass
+    def __init_subclass__(cls,**kwargs):
+        super().__init_subclass__(**kwargs)
+        if "ingest" in cls.__dict__:
+            cls.ingest = instrument(cls.ingest)
+
 
     
 class ZipDataIngestor(DataIngestor):
@@ -18,14 +37,17 @@ class ZipDataIngestor(DataIngestor):
             raise ValueError("The provided file is not a .zip file")
 ## Extract zipfile using zipfile in python 
         with zipfile.ZipFile(file_path,"r") as f:
+## Several csv files (e.g. one per region and month) are parsed in parallel straight from the archive and stacked
+            members = [name for name in f.namelist() if name.endswith(".csv") and "__MACOSX" not in name]
+            if len(members) > 1:
+                logging.info(f"{len(members)} csv files in the archive , reading all of them.")
+                return MultiFileZipDataIngestor().ingest(file_path)
             f.extractall("extracted_data")
 ## check whether there is a csv file or not 
         extracted_file = os.listdir("extracted_data")## filenames in the form of list 
         csv_files = [ f for f in extracted_file if f.endswith(".csv")]
         if len(csv_files) == 0:
             raise FileNotFoundError("No csv file is present in the extracted data.")
-        if len(csv_files) > 1:
-            raise ValueError("Multiple CSV File. Please specify which one to use.")
 ## If csv present then we have to convert it into DataFrame
         csv_file_path = os.path.join("extracted_data",csv_files[0])
         df = pd.read_csv(csv_file_path)
@@ -33,15 +55,342 @@ class ZipDataIngestor(DataIngestor):
 ## Return the DataFrame
         return df 
     
+
+## Streaming version of the zip ingestor. The csv member is read straight out of the archive
+## (nothing is extracted to disk) and handed back as an iterator of DataFrame chunks,
+## so only chunk_size rows are held in memory at a time.
+## member -> name of the csv inside the zip (needed when the archive holds more than one csv)
+## usecols -> subset of columns to parse , dtype -> column types to pin while parsing
+## sample_rows -> rows read up front to infer the schema every chunk is cast to. Columns that
+##                are empty in the sample are pinned to object.
+class StreamingZipDataIngestor(DataIngestor):
+    def __init__(self,chunk_size=100_000,member=None,usecols=None,dtype=None,sample_rows=10_000):
+        self.chunk_size = chunk_size
+        self.member = member
+        self.usecols = usecols
+        self.dtype = dtype
+        self.sample_rows = sample_rows
+
+    def _resolve_member(self,archive:zipfile.ZipFile) -> str:
+        csv_files = [name for name in archive.namelist() if name.endswith(".csv")]
+        if self.member is not None:
+            if self.member not in csv_files:
+                raise FileNotFoundError(f"{self.member} is not a csv file present in the archive.")
+            return self.member
+        if len(csv_files) == 0:
+            raise FileNotFoundError("No csv file is present in the archive.")
+        if len(csv_files) > 1:
+            raise ValueError("Multiple CSV File. Please specify which one to use.")
+        return csv_files[0]
+
+    def ingest(self,file_path:str) -> Iterator[pd.DataFrame]:
+        if not file_path.endswith(".zip"):
+            raise ValueError("The provided file is not a .zip file")
+        ## Validate the archive eagerly so errors show up at call time and not on first next()
+        with zipfile.ZipFile(file_path,"r") as archive:
+            member = self._resolve_member(archive)
+        logging.info(f"Streaming {member} from {file_path} in chunks of {self.chunk_size} rows.")
+        return self._iter_chunks(file_path,member)
+
+    def _infer_dtypes(self,archive:zipfile.ZipFile,member:str) -> dict:
+        with archive.open(member) as f:
+            sample = pd.read_csv(f,nrows=self.sample_rows,usecols=self.usecols,dtype=self.dtype)
+        empty = sample.columns[sample.isna().all().to_numpy()]
+        return {column: object if column in empty else dtype for column,dtype in sample.dtypes.items()}
+
+    def _iter_chunks(self,file_path:str,member:str) -> Iterator[pd.DataFrame]:
+        with zipfile.ZipFile(file_path,"r") as archive:
+            dtypes = self._infer_dtypes(archive,member)
+            with archive.open(member) as f:
+                reader = pd.read_csv(f,chunksize=self.chunk_size,usecols=self.usecols,dtype=self.dtype)
+                for chunk in reader:
+                    ## Cast to the pinned types so every chunk comes out with the same schema
+                    yield self._align_dtypes(chunk,dtypes)
+
+    ## A column that cannot be cast widens the pinned type (int -> float64 for missing values ,
+    ## anything else -> object) for this chunk and all the following ones.
+    @staticmethod
+    def _align_dtypes(chunk:pd.DataFrame,dtypes:dict) -> pd.DataFrame:
+        for column,dtype in dtypes.items():
+            if chunk[column].dtype == dtype:
+                continue
+            try:
+                chunk[column] = chunk[column].astype(dtype)
+            except (TypeError,ValueError):
+                widened = np.float64 if pd.api.types.is_integer_dtype(dtype) and pd.api.types.is_numeric_dtype(chunk[column]) else object
+                logging.warning(f"Column {column} could not be cast to {dtype}, widening it to {np.dtype(widened)}.")
+                dtypes[column] = widened
+                chunk[column] = chunk[column].astype(widened)
+        return chunk
+
+
+## Filters are (column , operator , value) tuples such as ("Yr Sold", ">=", 2008) or the same
+## written as a string "Yr Sold >= 2008". All filters of a list must hold (AND).
+FILTER_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+_FILTER_PATTERN = re.compile(r"^\s*(.+?)\s*(==|!=|<=|>=|<|>)\s*(.+?)\s*$")
+_MEMBERSHIP_PATTERN = re.compile(r"^\s*(.+?)\s+(not in|in)\s+(.+?)\s*$")
+_PARTITION_PATTERN = re.compile(r"^([^=]+)=(.*)$")
+
+
+## "2008" -> 2008 , "1.5" -> 1.5 , "'RL'" -> "RL"
+def _parse_value(text:str):
+    text = text.strip()
+    for cast in (int,float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text.strip("'\"")
+
+
+def parse_filter(text:str) -> tuple:
+    match = _FILTER_PATTERN.match(text) or _MEMBERSHIP_PATTERN.match(text)
+    if match is None:
+        raise ValueError(f"Cannot parse filter : {text}")
+    column,op,value = match.groups()
+    if op in ("in","not in"):
+        value = [_parse_value(item) for item in value.strip("()[]").split(",") if item.strip()]
+    else:
+        value = _parse_value(value)
+    return column,op,value
+
+
+def normalize_filters(filters) -> list:
+    normalized = []
+    for item in filters or []:
+        column,op,value = parse_filter(item) if isinstance(item,str) else item
+        if op not in FILTER_OPERATORS and op not in ("in","not in"):
+            raise ValueError(f"Unsupported filter operator : {op}")
+        normalized.append((column,op,value))
+    return normalized
+
+
+## Hive style partition values of a path , "region=north/month=2008-01/data.csv" -> {"region": "north", "month": "2008-01"}
+## Values are typed like the filter values so "Yr Sold=2008" compares against 2008.
+def partition_values(path:str) -> dict:
+    values = {}
+    for part in re.split(r"[\\/]",path)[:-1]:
+        match = _PARTITION_PATTERN.match(part)
+        if match:
+            values[match.group(1)] = _parse_value(match.group(2))
+    return values
+
+
+def _holds(value,op,target) -> bool:
+    if op == "in":
+        return value in target
+    if op == "not in":
+        return value not in target
+    return FILTER_OPERATORS[op](value,target)
+
+
+def _row_mask(df:pd.DataFrame,filters:list):
+    mask = pd.Series(True,index=df.index)
+    for column,op,value in filters:
+        if op == "in":
+            mask &= df[column].isin(value)
+        elif op == "not in":
+            mask &= ~df[column].isin(value)
+        else:
+            mask &= FILTER_OPERATORS[op](df[column],value)
+    return mask
+
+
+## Runs in the worker processes : parse one file (or zip member) , reading only the needed
+## columns and applying the row filters before the frame is sent back.
+## task -> (source , member , file format , partition values , columns , row filters)
+def _read_file(task) -> pd.DataFrame:
+    source,member,file_format,partitions,columns,filters = task
+    needed = None
+    if columns is not None:
+        needed = [column for column in columns if column not in partitions]
+        needed += [column for column,_,_ in filters if column not in needed]
+    if file_format == ".parquet":
+        df = pd.read_parquet(source,columns=needed,filters=filters or None)
+    elif member is not None:
+        with zipfile.ZipFile(source,"r") as archive:
+            with archive.open(member) as f:
+                df = pd.read_csv(f,usecols=needed)
+    else:
+        df = pd.read_csv(source,usecols=needed)
+    if filters and file_format != ".parquet":
+        df = df.loc[_row_mask(df,filters)].reset_index(drop=True)
+    for key,value in partitions.items():
+        if columns is None or key in columns:
+            df[key] = value
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+
+## Base for the ingestors that read many files into one frame.
+## columns -> only these columns are parsed (partition columns included)
+## filters -> filters on partition columns skip whole files , the others are applied to the rows
+##            of every file inside the workers (parquet pushes them into the reader)
+## n_workers -> size of the process pool , None uses one per cpu , 1 reads in this process
+class MultiFileDataIngestor(DataIngestor):
+    def __init__(self,columns=None,filters=None,n_workers=None):
+        self.columns = list(columns) if columns is not None else None
+        self.filters = normalize_filters(filters)
+        self.n_workers = n_workers
+
+    ## (source , zip member or None , file format , path that carries the partitions)
+    @abstractmethod
+    def list_files(self,file_path:str) -> list:
+        pass
+
+    def ingest(self,file_path:str) -> pd.DataFrame:
+        files = self.list_files(file_path)
+        if len(files) == 0:
+            raise FileNotFoundError(f"No csv or parquet file found in {file_path}.")
+        tasks = []
+        for source,member,file_format,partition_path in files:
+            partitions = partition_values(partition_path)
+            if not all(_holds(partitions[column],op,value) for column,op,value in self.filters if column in partitions):
+                continue
+            row_filters = [item for item in self.filters if item[0] not in partitions]
+            tasks.append((source,member,file_format,partitions,self.columns,row_filters))
+        logging.info(f"Reading {len(tasks)} of {len(files)} files from {file_path} ({len(files) - len(tasks)} pruned by partition filters).")
+        if len(tasks) == 0:
+            return pd.DataFrame(columns=self.columns or [])
+
+        if self.n_workers == 1 or len(tasks) == 1:
+            frames = [_read_file(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                frames = list(executor.map(_read_file,tasks))
+        return pd.concat(frames,ignore_index=True)
+
+
+## Every csv in a zip archive (or the members matching `members` , a glob pattern or a list)
+## read straight out of the archive. Members in region=*/month=* folders get those columns.
+class MultiFileZipDataIngestor(MultiFileDataIngestor):
+    def __init__(self,members=None,columns=None,filters=None,n_workers=None):
+        super().__init__(columns,filters,n_workers)
+        self.members = members
+
+    def list_files(self,file_path:str) -> list:
+        if not file_path.endswith(".zip"):
+            raise ValueError("The provided file is not a .zip file")
+        with zipfile.ZipFile(file_path,"r") as archive:
+            names = [name for name in archive.namelist() if name.endswith(".csv") and "__MACOSX" not in name]
+        if isinstance(self.members,str):
+            names = [name for name in names if fnmatch.fnmatch(name,self.members)]
+        elif self.members is not None:
+            missing = set(self.members) - set(names)
+            if missing:
+                raise FileNotFoundError(f"{sorted(missing)} not present in the archive.")
+            names = list(self.members)
+        return [(file_path,name,".csv",name) for name in names]
+
+
+## A directory of csv / parquet files , partitioned or not , e.g. data/region=north/month=2008-01/part-0.parquet
+## pattern -> glob of the files to read relative to the directory
+class PartitionedDirectoryDataIngestor(MultiFileDataIngestor):
+    def __init__(self,pattern="**/*",columns=None,filters=None,n_workers=None):
+        super().__init__(columns,filters,n_workers)
+        self.pattern = pattern
+
+    def list_files(self,file_path:str) -> list:
+        if not os.path.isdir(file_path):
+            raise ValueError(f"{file_path} is not a directory")
+        files = []
+        for path in sorted(glob.glob(os.path.join(file_path,self.pattern),recursive=True)):
+            file_format = os.path.splitext(path)[1]
+            if file_format in (".csv",".parquet") and os.path.isfile(path):
+                files.append((path,None,file_format,os.path.relpath(path,file_path)))
+        return files
+
+
+## A single plain csv or parquet file with the same column / filter options
+class FileDataIngestor(MultiFileDataIngestor):
+    def __init__(self,columns=None,filters=None):
+        super().__init__(columns,filters,n_workers=1)
+
+    def list_files(self,file_path:str) -> list:
+        file_format = os.path.splitext(file_path)[1]
+        if file_format not in (".csv",".parquet"):
+            raise ValueError("The provided file is not a .csv or .parquet file")
+        return [(file_path,None,file_format,os.path.basename(file_path))]
+    
+
+## Wraps another ingestor and keeps the parsed frame as a parquet file in cache_dir.
+## The cache is keyed by the sha256 of the source archive , so when the archive changes
+## the key changes and the frame is parsed again. Parquet stores the schema so dtypes are
+## pinned between runs.
+class CachedDataIngestor(DataIngestor):
+    def __init__(self,ingestor:DataIngestor,cache_dir="cached_data"):
+        self.ingestor = ingestor
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def file_hash(file_path:str,block_size=1 << 20) -> str:
+        digest = hashlib.sha256()
+        with open(file_path,"rb") as f:
+            for block in iter(lambda: f.read(block_size),b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    ## <stem>-<source hash>[-<options hash>].parquet , ingestors with options (columns ,
+    ## filters , ...) get their own entry per setting next to the others for the same source
+    def cache_path(self,file_path:str,source_hash:str=None) -> str:
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        key = (source_hash or self.file_hash(file_path))[:16]
+        options = vars(self.ingestor)
+        if options:
+            key += "-" + hashlib.sha256(json.dumps(options,sort_keys=True,default=repr).encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.cache_dir,f"{stem}-{key}.parquet")
+
+    def ingest(self,file_path:str) -> pd.DataFrame:
+        source_hash = self.file_hash(file_path)
+        cache_path = self.cache_path(file_path,source_hash)
+        if os.path.exists(cache_path):
+            logging.info(f"Loading cached data from {cache_path}")
+            return pd.read_parquet(cache_path)
+
+        logging.info(f"No cache found for {file_path}. Parsing the source file.")
+        df = self.ingestor.ingest(file_path)
+        os.makedirs(self.cache_dir,exist_ok=True)
+        ## Remove caches written for older versions of the same archive , entries for other
+        ## option sets of the current version are kept
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        for entry in glob.glob(os.path.join(self.cache_dir,f"{glob.escape(stem)}-*.parquet")):
+            entry_hash = os.path.basename(entry)[len(stem) + 1:].split("-")[0].split(".")[0]
+            if entry_hash != source_hash[:16]:
+                os.remove(entry)
+        ## Write to a temp file first so an interrupted run never leaves a half written cache
+        tmp_path = cache_path + ".tmp"
+        df.to_parquet(tmp_path,index=False)
+        os.replace(tmp_path,cache_path)
+        logging.info(f"Cached data written to {cache_path}")
+        return df
     
     
+## file_extension "" means a (partitioned) directory. kwargs go to the ingestor , e.g.
+## columns=[...] , filters=["Yr Sold >= 2008"] , n_workers=4 , members="region=*/*.csv"
 class DataIngestorFactory:
     @staticmethod
-    def get_data_ingestor(file_extension:str) -> DataIngestor:
+    def get_data_ingestor(file_extension:str,streaming=False,cache_dir=None,**kwargs) -> DataIngestor:
         if file_extension == ".zip":
-            return ZipDataIngestor()
+            if streaming:
+                return StreamingZipDataIngestor(**kwargs)
+            ingestor = MultiFileZipDataIngestor(**kwargs) if kwargs else ZipDataIngestor()
+        elif file_extension in (".csv",".parquet"):
+            ingestor = FileDataIngestor(**kwargs)
+        elif file_extension == "":
+            return PartitionedDirectoryDataIngestor(**kwargs)
         else:
             raise ValueError(f"No ingestor available for file extension : {file_extension}")
+        if cache_dir is not None and file_extension != ".parquet":
+            return CachedDataIngestor(ingestor,cache_dir=cache_dir)
+        return ingestor
 
 
 if __name__ == "__main__":
@@ -54,4 +403,19 @@ if __name__ == "__main__":
     df = data_ingestor.ingest(file_path)
     
     print(df.head())
+    
+    ## Cached example , the first run parses the csv and later runs load the parquet cache
+    cached_ingestor = DataIngestorFactory.get_data_ingestor(file_extension,cache_dir="cached_data")
+    df = cached_ingestor.ingest(file_path)
+    
+    ## Streaming example , the archive is read chunk by chunk without extracting it
+    streaming_ingestor = DataIngestorFactory.get_data_ingestor(file_extension,streaming=True,chunk_size=1000)
+    for chunk in streaming_ingestor.ingest(file_path):
+        print(chunk.shape)
+
+    ## Partitioned directory example , files of region=*/month=* folders read in parallel ,
+    ## only the 2008+ rows and three columns are kept
+    partitioned_ingestor = DataIngestorFactory.get_data_ingestor("",columns=["Neighborhood","Yr Sold","SalePrice"],
+                                                                 filters=["Yr Sold >= 2008"],n_workers=4)
+    df = partitioned_ingestor.ingest("data/partitioned")
         
\ No newline at end of file
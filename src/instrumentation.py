@@ -0,0 +1,193 @@
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  ## not available on Windows , peak RSS is then not reported
+    resource = None
+
+logging.basicConfig(level=logging.INFO,format="%(asctime)s - %(levelname)s - %(message)s",force=True)
+
+
+## (rows , columns) of the first frame / array / tuple of frames found in a value
+def _shape_of(value):
+    if isinstance(value,(pd.DataFrame,np.ndarray)) and value.ndim == 2:
+        return [int(value.shape[0]),int(value.shape[1])]
+    if isinstance(value,(pd.Series,np.ndarray)):
+        return [int(value.shape[0]),1]
+    if isinstance(value,(tuple,list)) and value:
+        return _shape_of(value[0])
+    return None
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+## Records one entry per instrumented call : wall time , CPU time , peak memory delta and
+## the input / output shape. With trace_memory the bytes still held after the call
+## (allocated_bytes) are recorded too , memory_summary adds them up per stage. Disabled by default , the instrumented methods then call
+## straight through.
+## trace_memory=True -> exact peak of python allocations with tracemalloc (slower)
+## profile=True -> run the outermost instrumented call under cProfile , the top functions are
+##                 kept in the record and the .prof files written to profile_dir if given
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.profile = False
+        self.profile_dir = None
+        self.records = []
+        self._started_tracing = False
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+
+    def enable(self,trace_memory=False,profile=False,profile_dir=None):
+        self.enabled = True
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.profile_dir = profile_dir
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        logging.info("Instrumentation enabled.")
+        return self
+
+    def disable(self):
+        self.enabled = False
+        ## a tracemalloc session started by someone else (e.g. the benchmark) is left running
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_tracing = False
+        logging.info("Instrumentation disabled.")
+
+    def reset(self):
+        self.records = []
+        self._origin = time.perf_counter()
+
+    def call(self,stage:str,func,args,kwargs,execution_mode=None):
+        depth = getattr(self._local,"depth",0)
+        self._local.depth = depth + 1
+        outermost = depth == 0
+        ## peaks are only reset on the outermost call , nested stages report the peak since it started
+        if self.trace_memory and outermost:
+            tracemalloc.reset_peak()
+        traced_start = tracemalloc.get_traced_memory()[0] if self.trace_memory else None
+        rss_start = _peak_rss_kb()
+        profiler = cProfile.Profile() if self.profile and outermost else None
+
+        wall_start,cpu_start = time.perf_counter(),time.process_time()
+        try:
+            if profiler is not None:
+                result = profiler.runcall(func,*args,**kwargs)
+            else:
+                result = func(*args,**kwargs)
+        finally:
+            self._local.depth = depth
+        wall_end,cpu_end = time.perf_counter(),time.process_time()
+
+        record = {
+            "stage": stage,
+            "start_s": wall_start - self._origin,
+            "wall_s": wall_end - wall_start,
+            "cpu_s": cpu_end - cpu_start,
+            "input_shape": next((shape for shape in map(_shape_of,args[1:]) if shape),None),
+            "output_shape": _shape_of(result),
+            "thread": threading.current_thread().name,
+            "depth": depth,
+        }
+        if execution_mode is not None:
+            record["execution_mode"] = execution_mode
+        if self.trace_memory:
+            traced_end,traced_peak = tracemalloc.get_traced_memory()
+            record["peak_memory_delta_bytes"] = traced_peak - traced_start
+            record["allocated_bytes"] = traced_end - traced_start
+        if rss_start is not None:
+            record["peak_rss_delta_kb"] = _peak_rss_kb() - rss_start
+        if profiler is not None:
+            record["profile"] = self._profile_summary(profiler,stage)
+        self.records.append(record)
+        return result
+
+    def _profile_summary(self,profiler:cProfile.Profile,stage:str,top=20) -> str:
+        if self.profile_dir is not None:
+            os.makedirs(self.profile_dir,exist_ok=True)
+            profiler.dump_stats(os.path.join(self.profile_dir,f"{stage}-{len(self.records)}.prof"))
+        stream = io.StringIO()
+        pstats.Stats(profiler,stream=stream).sort_stats("cumulative").print_stats(top)
+        return stream.getvalue()
+
+    ## Total / mean time per stage , slowest first
+    def summary(self) -> pd.DataFrame:
+        if not self.records:
+            return pd.DataFrame()
+        records = pd.DataFrame(self.records)
+        return (records.groupby("stage")[["wall_s","cpu_s"]]
+                .agg(["count","sum","mean"])
+                .sort_values(("wall_s","sum"),ascending=False))
+
+    ## Bytes allocated per stage and execution mode , most first. Needs enable(trace_memory=True).
+    ## Comparing two runs catches steps that start copying the frame again.
+    def memory_summary(self) -> pd.DataFrame:
+        records = pd.DataFrame(self.records)
+        if "allocated_bytes" not in records:
+            return pd.DataFrame()
+        if "execution_mode" not in records:
+            records["execution_mode"] = None
+        records["execution_mode"] = records["execution_mode"].fillna("-")
+        return (records.groupby(["stage","execution_mode"])[["allocated_bytes","peak_memory_delta_bytes"]]
+                .agg(["sum","max"])
+                .sort_values(("allocated_bytes","sum"),ascending=False))
+
+    def export_json(self,path:str):
+        with open(path,"w") as f:
+            json.dump(self.records,f,indent=2)
+        logging.info(f"Instrumentation records written to {path}")
+
+    ## Chrome trace event format , open in chrome://tracing or https://ui.perfetto.dev
+    def export_chrome_trace(self,path:str):
+        events = []
+        for record in self.records:
+            args = {key: value for key,value in record.items() if key not in ("stage","start_s","wall_s","thread","profile")}
+            events.append({
+                "name": record["stage"],
+                "ph": "X",
+                "ts": record["start_s"] * 1e6,
+                "dur": record["wall_s"] * 1e6,
+                "pid": os.getpid(),
+                "tid": record["thread"],
+                "args": args,
+            })
+        with open(path,"w") as f:
+            json.dump({"traceEvents": events},f)
+        logging.info(f"Chrome trace written to {path}")
+
+
+profiler = Profiler()
+
+
+## Decorator for the context class methods. The stage name is Class.method[Strategy] so the
+## records show which strategy ran.
+def instrument(func):
+    @functools.wraps(func)
+    def wrapper(self,*args,**kwargs):
+        if not profiler.enabled:
+            return func(self,*args,**kwargs)
+        strategy = getattr(self,"strategy",None)
+        stage = f"{type(self).__name__}.{func.__name__}"
+        if strategy is not None:
+            stage += f"[{type(strategy).__name__}]"
+        return profiler.call(stage,func,(self,) + args,kwargs,getattr(self,"execution_mode",None))
+    return wrapper
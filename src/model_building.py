@@ -1,39 +1,423 @@
+import contextlib
 import logging
+import os
 from abc import ABC ,abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 from sklearn.base import RegressorMixin
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler,FunctionTransformer
+from sklearn.linear_model import LinearRegression,Ridge,Lasso,ElasticNet,SGDRegressor
+from sklearn.ensemble import GradientBoostingRegressor,RandomForestRegressor
+from sklearn.model_selection import cross_val_score
+from src.instrumentation import instrument
+from src.shared_dataset import SharedDataset, SharedDatasetHandle
 
 logging.basicConfig(level = logging.INFO,format = "%(asctime)s - %(levelname)s - %(message)s ",force=True)
 
+## Frames coming out of the sparse encoders hold pandas sparse columns.
+## They are turned into one scipy csr matrix (dense columns first , then the sparse block)
+## so the encoded block is never expanded to dense float64.
+def has_sparse_columns(X:pd.DataFrame) -> bool:
+    return any(isinstance(dtype,pd.SparseDtype) for dtype in X.dtypes)
+
+def to_sparse_matrix(X:pd.DataFrame) -> sp.csr_matrix:
+    sparse_columns = [column for column,dtype in X.dtypes.items() if isinstance(dtype,pd.SparseDtype)]
+    dense = X.drop(columns=sparse_columns)
+    blocks = []
+    if len(dense.columns):
+        blocks.append(sp.csr_matrix(dense.to_numpy(dtype=np.float64)))
+    if sparse_columns:
+        blocks.append(X[sparse_columns].sparse.to_coo().tocsr().astype(np.float64))
+    return sp.hstack(blocks,format="csr")
+
+def check_training_data(X_train:pd.DataFrame,y_train:pd.Series):
+    if not isinstance(X_train,pd.DataFrame):
+        raise TypeError("X_train must be a pandas DataFrame.")
+    if not isinstance(y_train,pd.Series):
+        raise TypeError("y_train must be a pandas series.")
+
+## Linear models get a StandardScaler in front , tree models are used as they are.
+## Sparse frames go through to_sparse_matrix first in both cases.
+def make_pipeline(X_train:pd.DataFrame,model:RegressorMixin,scale=True) -> Pipeline:
+    steps = []
+    if has_sparse_columns(X_train):
+        logging.info("Sparse features found. Training on a scipy sparse matrix.")
+        steps.append(("sparse", FunctionTransformer(to_sparse_matrix,accept_sparse=True)))
+        ## Centering would densify the matrix , scaling alone gives the same fitted predictions
+        if scale:
+            steps.append(("scalar", StandardScaler(with_mean=False)))
+    elif scale:
+        steps.append(("scalar", StandardScaler()))
+    steps.append(("model", model))
+    return Pipeline(steps)
+
+
+## build_pipeline returns the unfitted pipeline so a search can cross validate it ,
+## build_and_train_model fits it on the training data.
 class ModelBuildingStrategy(ABC):
     @abstractmethod
     def build_and_train_model(self,X_train:pd.DataFrame,y_train:pd.Series)-> RegressorMixin:
         pass
+
+    def build_pipeline(self,X_train:pd.DataFrame) -> Pipeline:
+        raise NotImplementedError(f"{type(self).__name__} does not expose an unfitted pipeline.")
+
+    ## fitted state (attributes ending with "_") is not part of the configuration
+    def __repr__(self):
+        params = ",".join(f"{key}={value!r}" for key,value in vars(self).items() if not key.endswith("_"))
+        return f"{type(self).__name__}({params})"
+
+    ## Warm start for the iterative learners : the pipeline fitted last time is kept and its
+    ## model starts from the previous solution (coefficients , boosting stages) on the next fit.
+    def _fit_pipeline(self,X_train:pd.DataFrame,y_train:pd.Series) -> Pipeline:
+        pipeline = getattr(self,"pipeline_",None)
+        if getattr(self,"warm_start",False) and pipeline is not None:
+            logging.info("Warm starting from the previously fitted model.")
+            pipeline.set_params(model__warm_start=True)
+            self._before_warm_start(pipeline)
+        else:
+            pipeline = self.build_pipeline(X_train)
+        self.pipeline_ = pipeline.fit(X_train,y_train)
+        return self.pipeline_
+
+    def _before_warm_start(self,pipeline:Pipeline):
+        pass
     
 class LinearRegressionStrategy(ModelBuildingStrategy):
+
+    def build_pipeline(self,X_train:pd.DataFrame) -> Pipeline:
+        return make_pipeline(X_train,LinearRegression())
     
     def build_and_train_model(self, X_train:pd.DataFrame, y_train:pd.Series) -> Pipeline:
-        if not isinstance(X_train,pd.DataFrame):
-            raise TypeError("X_train must be a pandas DataFrame.")
-        if not isinstance(y_train,pd.Series):
-            raise TypeError("y_train must be a pandas series.")
+        check_training_data(X_train,y_train)
         
         logging.info("Initializing Linear Regression Model with scaling")
-        
-        pipeline = Pipeline(
-            [
-            ("scalar", StandardScaler()),
-            ("model", LinearRegression()),
-            ]
-        )
+        pipeline = self.build_pipeline(X_train)
         logging.info("Training Linear Regression Model.")
         pipeline.fit(X_train,y_train)
         
         logging.info("Model training Completed.")
         return pipeline
+
+
+## Ridge (L2) , Lasso (L1) and ElasticNet (L1 + L2) are regularized linear regressions.
+## alpha is the strength of the penalty , l1_ratio the share of L1 in ElasticNet.
+class RidgeRegressionStrategy(ModelBuildingStrategy):
+    def __init__(self,alpha=1.0):
+        self.alpha = alpha
+
+    def build_pipeline(self,X_train:pd.DataFrame) -> Pipeline:
+        return make_pipeline(X_train,Ridge(alpha=self.alpha))
+
+    def build_and_train_model(self, X_train:pd.DataFrame, y_train:pd.Series) -> Pipeline:
+        check_training_data(X_train,y_train)
+        logging.info(f"Training Ridge Regression Model with alpha={self.alpha}.")
+        pipeline = self.build_pipeline(X_train).fit(X_train,y_train)
+        logging.info("Model training Completed.")
+        return pipeline
+
+## warm_start=True -> refits start from the coefficients of the previous fit
+class LassoRegressionStrategy(ModelBuildingStrategy):
+    def __init__(self,alpha=1.0,max_iter=10000,warm_start=False):
+        self.alpha = alpha
+        self.max_iter = max_iter
+        self.warm_start = warm_start
+
+    def build_pipeline(self,X_train:pd.DataFrame) -> Pipeline:
+        return make_pipeline(X_train,Lasso(alpha=self.alpha,max_iter=self.max_iter))
+
+    def build_and_train_model(self, X_train:pd.DataFrame, y_train:pd.Series) -> Pipeline:
+        check_training_data(X_train,y_train)
+        logging.info(f"Training Lasso Regression Model with alpha={self.alpha}.")
+        pipeline = self._fit_pipeline(X_train,y_train)
+        logging.info("Model training Completed.")
+        return pipeline
+
+class ElasticNetRegressionStrategy(ModelBuildingStrategy):
+    def __init__(self,alpha=1.0,l1_ratio=0.5,max_iter=10000,warm_start=False):
+        self.alpha = alpha
+        self.l1_ratio = l1_ratio
+        self.max_iter = max_iter
+        self.warm_start = warm_start
+
+    def build_pipeline(self,X_train:pd.DataFrame) -> Pipeline:
+        return make_pipeline(X_train,ElasticNet(alpha=self.alpha,l1_ratio=self.l1_ratio,max_iter=self.max_iter))
+
+    def build_and_train_model(self, X_train:pd.DataFrame, y_train:pd.Series) -> Pipeline:
+        check_training_data(X_train,y_train)
+        logging.info(f"Training ElasticNet Model with alpha={self.alpha} and l1_ratio={self.l1_ratio}.")
+        pipeline = self._fit_pipeline(X_train,y_train)
+        logging.info("Model training Completed.")
+        return pipeline
+
+
+## Tree ensembles , no scaling needed. Extra keyword arguments go straight to the sklearn model.
+## warm_start=True -> every refit keeps the fitted boosting stages and adds warm_start_stages
+##                    new ones trained on the data it is given
+class GradientBoostingStrategy(ModelBuildingStrategy):
+    def __init__(self,warm_start=False,warm_start_stages=50,**params):
+        self.warm_start = warm_start
+        self.warm_start_stages = warm_start_stages
+        self.params = params
+
+    def _before_warm_start(self,pipeline:Pipeline):
+        model = pipeline.named_steps["model"]
+        model.set_params(n_estimators=model.n_estimators_ + self.warm_start_stages)
+
+    def build_pipeline(self,X_train:pd.DataFrame) -> Pipeline:
+        return make_pipeline(X_train,GradientBoostingRegressor(**self.params),scale=False)
+
+    def build_and_train_model(self, X_train:pd.DataFrame, y_train:pd.Series) -> Pipeline:
+        check_training_data(X_train,y_train)
+        logging.info(f"Training Gradient Boosting Model with {self.params}.")
+        pipeline = self._fit_pipeline(X_train,y_train)
+        logging.info("Model training Completed.")
+        return pipeline
+
+class RandomForestStrategy(ModelBuildingStrategy):
+    def __init__(self,**params):
+        self.params = params
+
+    def build_pipeline(self,X_train:pd.DataFrame) -> Pipeline:
+        return make_pipeline(X_train,RandomForestRegressor(**self.params),scale=False)
+
+    def build_and_train_model(self, X_train:pd.DataFrame, y_train:pd.Series) -> Pipeline:
+        check_training_data(X_train,y_train)
+        logging.info(f"Training Random Forest Model with {self.params}.")
+        pipeline = self.build_pipeline(X_train).fit(X_train,y_train)
+        logging.info("Model training Completed.")
+        return pipeline
+
+
+## Sufficient statistics of a least squares fit : row count , column means and the centered
+## cross products X^T X and X^T y. Batches are merged with the pairwise (Chan) update so
+## the statistics stay numerically stable , and two accumulators can be merged as well.
+class LinearSufficientStatistics:
+    def __init__(self):
+        self.n = 0
+        self.x_mean = None
+        self.y_mean = 0.0
+        self.xx = None
+        self.xy = None
+
+    def update(self,X:np.ndarray,y:np.ndarray):
+        X = np.asarray(X,dtype=np.float64)
+        y = np.asarray(y,dtype=np.float64)
+        n = len(y)
+        if n == 0:
+            return self
+        x_mean,y_mean = X.mean(axis=0),y.mean()
+        X_centered,y_centered = X - x_mean,y - y_mean
+        return self._combine(n,x_mean,y_mean,X_centered.T @ X_centered,X_centered.T @ y_centered)
+
+    def merge(self,other:"LinearSufficientStatistics"):
+        if other.n:
+            self._combine(other.n,other.x_mean,other.y_mean,other.xx,other.xy)
+        return self
+
+    def _combine(self,n,x_mean,y_mean,xx,xy):
+        if self.n == 0:
+            self.n,self.x_mean,self.y_mean,self.xx,self.xy = n,x_mean,y_mean,xx,xy
+            return self
+        total = self.n + n
+        dx,dy = x_mean - self.x_mean,y_mean - self.y_mean
+        weight = self.n * n / total
+        self.xx = self.xx + xx + weight * np.outer(dx,dx)
+        self.xy = self.xy + xy + weight * dx * dy
+        self.x_mean = self.x_mean + dx * n / total
+        self.y_mean = self.y_mean + dy * n / total
+        self.n = total
+        return self
+
+    ## Solve the normal equations on standardized columns like StandardScaler + LinearRegression.
+    ## lstsq gives the minimum norm solution when columns are collinear , as LinearRegression does.
+    def solve(self):
+        variance = np.diag(self.xx) / self.n
+        scale = np.sqrt(variance)
+        scale[scale == 0] = 1.0
+        gram = self.xx / np.outer(scale,scale)
+        cross = self.xy / scale
+        coef,_,rank,singular = np.linalg.lstsq(gram,cross,rcond=None)
+        ## the singular values of the gram matrix are the squares of those of the centered
+        ## standardized rows , the ones LinearRegression reports in singular_
+        return variance,scale,coef,rank,np.sqrt(np.clip(singular,0,None))
+
+    ## Fitted StandardScaler + LinearRegression pipeline built from the statistics
+    def to_pipeline(self,feature_names=None) -> Pipeline:
+        variance,scale,coef,rank,singular = self.solve()
+        scaler = StandardScaler()
+        scaler.mean_,scaler.var_,scaler.scale_ = self.x_mean.copy(),variance,scale
+        scaler.n_samples_seen_ = self.n
+        scaler.n_features_in_ = len(scale)
+        model = LinearRegression()
+        model.coef_,model.intercept_ = coef,float(self.y_mean)
+        model.rank_,model.singular_ = rank,singular
+        model.n_features_in_ = len(coef)
+        if feature_names is not None:
+            scaler.feature_names_in_ = np.asarray(feature_names,dtype=object)
+        return Pipeline([("scalar", scaler),("model", model)])
+
+
+## Linear regression that can be updated with new rows only.
+## build_and_train_model fits from scratch , partial_fit adds the newly ingested rows to the
+## kept sufficient statistics and re-solves , giving the same coefficients as a full refit on
+## all the rows seen so far. The strategy object holds the statistics , save it with joblib
+## between retrains.
+class IncrementalLinearRegressionStrategy(ModelBuildingStrategy):
+    def __init__(self):
+        self.statistics_ = LinearSufficientStatistics()
+        self.feature_names_ = None
+
+    def build_and_train_model(self, X_train:pd.DataFrame, y_train:pd.Series) -> Pipeline:
+        self.statistics_ = LinearSufficientStatistics()
+        self.feature_names_ = None
+        return self.partial_fit(X_train,y_train)
+
+    def partial_fit(self,X_new:pd.DataFrame,y_new:pd.Series) -> Pipeline:
+        check_training_data(X_new,y_new)
+        if has_sparse_columns(X_new):
+            raise TypeError("IncrementalLinearRegressionStrategy needs dense numeric features.")
+        if self.feature_names_ is None:
+            self.feature_names_ = list(X_new.columns)
+        elif list(X_new.columns) != self.feature_names_:
+            raise ValueError("New rows must have the same columns , in the same order , as the training data.")
+        logging.info(f"Updating linear regression statistics with {len(X_new)} new rows.")
+        self.statistics_.update(X_new.to_numpy(dtype=np.float64),y_new.to_numpy(dtype=np.float64))
+        pipeline = self.statistics_.to_pipeline(self.feature_names_)
+        logging.info(f"Model solved on {self.statistics_.n} rows in total.")
+        return pipeline
+
+
+## Linear regression trained from a chunk iterator (e.g. StreamingZipDataIngestor().ingest(path))
+## so the training data never has to fit in memory. Every chunk holds the features and the target.
+## solver="normal" -> one pass accumulating the sufficient statistics , the result is the same
+##                    StandardScaler + LinearRegression pipeline LinearRegressionStrategy fits
+## solver="sgd" -> a first pass fits the scaler , then n_epochs passes of mini batch SGD.
+##                 Needs chunks to be a function returning a fresh iterator for every pass.
+## feature_columns -> None takes every numeric column of the first chunk except the target
+## preprocess -> optional function applied to each chunk first (e.g. a fitted MissingValueHandler.transform)
+class OutOfCoreLinearRegressionStrategy(ModelBuildingStrategy):
+    def __init__(self,target_column="SalePrice",feature_columns=None,solver="normal",preprocess=None,
+                 n_epochs=5,sgd_params=None):
+        if solver not in ("normal","sgd"):
+            raise ValueError(f"Unknown solver {solver}.")
+        self.target_column = target_column
+        self.feature_columns = feature_columns
+        self.solver = solver
+        self.preprocess = preprocess
+        self.n_epochs = n_epochs
+        self.sgd_params = sgd_params or {}
+        self.feature_columns_ = None
+
+    def _iter_batches(self,chunks):
+        for chunk in chunks:
+            if self.preprocess is not None:
+                chunk = self.preprocess(chunk)
+            if self.feature_columns_ is None:
+                self.feature_columns_ = [column for column in chunk.select_dtypes(include="number").columns
+                                         if column != self.target_column]
+            X = chunk[self.feature_columns_].to_numpy(dtype=np.float64)
+            y = chunk[self.target_column].to_numpy(dtype=np.float64)
+            if np.isnan(X).any() or np.isnan(y).any():
+                raise ValueError("Chunks contain missing values. Handle them with preprocess first.")
+            yield X,y
+
+    def build_and_train_model(self, X_train, y_train=None) -> Pipeline:
+        chunks = X_train
+        ## the columns used by this fit , inferred from the first chunk when none were given
+        self.feature_columns_ = None if self.feature_columns is None else list(self.feature_columns)
+        if self.solver == "normal":
+            source = chunks() if callable(chunks) else chunks
+            statistics = LinearSufficientStatistics()
+            for X,y in self._iter_batches(source):
+                statistics.update(X,y)
+            logging.info(f"Solving the normal equations accumulated over {statistics.n} rows.")
+            pipeline = statistics.to_pipeline(self.feature_columns_)
+        else:
+            if not callable(chunks):
+                raise TypeError("The sgd solver needs a function returning a new chunk iterator for every pass.")
+            scaler = StandardScaler()
+            for X,_ in self._iter_batches(chunks()):
+                scaler.partial_fit(X)
+            model = SGDRegressor(**self.sgd_params)
+            for epoch in range(self.n_epochs):
+                for X,y in self._iter_batches(chunks()):
+                    model.partial_fit(scaler.transform(X),y)
+                logging.info(f"SGD epoch {epoch + 1}/{self.n_epochs} completed.")
+            scaler.feature_names_in_ = np.asarray(self.feature_columns_,dtype=object)
+            pipeline = Pipeline([("scalar", scaler),("model", model)])
+        logging.info("Model training Completed.")
+        return pipeline
+
+
+## The preprocessed training data is sent once to every worker process through the pool
+## initializer , so each candidate only ships its (small) strategy object. Dense numeric data
+## is put in shared memory instead and the workers attach to it without a copy.
+_search_data = {}
+
+def _init_search_worker(X_train:pd.DataFrame,y_train:pd.Series):
+    _search_data["X_train"] = X_train
+    _search_data["y_train"] = y_train
+
+def _init_shared_search_worker(handle:SharedDatasetHandle):
+    attached = handle.attach()
+    _search_data["attached"] = attached
+    _search_data["X_train"] = attached.frame()
+    _search_data["y_train"] = attached.target()
+
+def _score_candidate(candidate:ModelBuildingStrategy,cv:int,scoring:str) -> float:
+    X_train,y_train = _search_data["X_train"],_search_data["y_train"]
+    scores = cross_val_score(candidate.build_pipeline(X_train),X_train,y_train,cv=cv,scoring=scoring)
+    return float(np.mean(scores))
+
+## Cross validates every candidate strategy in parallel on a process pool and refits the
+## best one on the full training data.
+## candidates -> list of ModelBuildingStrategy objects (e.g. Ridge with different alphas) ,
+##               each must implement build_pipeline so it can be cross validated
+## n_workers -> number of processes , None uses every core
+## share_memory -> hand dense numeric training data to the workers through a SharedDataset
+## results_ keeps (candidate , mean cv score) sorted from best to worst.
+class ModelSearchStrategy(ModelBuildingStrategy):
+    def __init__(self,candidates:list,cv=5,scoring="neg_root_mean_squared_error",n_workers=None,share_memory=True):
+        self.candidates = list(candidates)
+        ## checked here , the stub would only fail inside a pool worker after the data is shared
+        unsupported = [type(candidate).__name__ for candidate in self.candidates
+                       if type(candidate).build_pipeline is ModelBuildingStrategy.build_pipeline]
+        if unsupported:
+            raise TypeError(f"Candidates {unsupported} do not expose an unfitted pipeline and cannot be searched.")
+        self.cv = cv
+        self.scoring = scoring
+        self.n_workers = n_workers
+        self.share_memory = share_memory
+        self.results_ = None
+
+    def _can_share(self,X_train:pd.DataFrame) -> bool:
+        return (self.share_memory and isinstance(X_train,pd.DataFrame) and not has_sparse_columns(X_train)
+                and all(pd.api.types.is_numeric_dtype(dtype) for dtype in X_train.dtypes))
+
+    def build_and_train_model(self, X_train:pd.DataFrame, y_train:pd.Series) -> Pipeline:
+        check_training_data(X_train,y_train)
+        n_workers = min(self.n_workers or os.cpu_count() or 1,len(self.candidates))
+        logging.info(f"Searching {len(self.candidates)} candidate models on {n_workers} workers.")
+        with contextlib.ExitStack() as stack:
+            if self._can_share(X_train):
+                dataset = stack.enter_context(SharedDataset(X_train,y_train))
+                initializer,initargs = _init_shared_search_worker,(dataset.handle,)
+            else:
+                initializer,initargs = _init_search_worker,(X_train,y_train)
+            with ProcessPoolExecutor(max_workers=n_workers,initializer=initializer,initargs=initargs) as executor:
+                futures = [executor.submit(_score_candidate,candidate,self.cv,self.scoring) for candidate in self.candidates]
+                scores = [future.result() for future in futures]
+        self.results_ = sorted(zip(self.candidates,scores),key=lambda result: result[1],reverse=True)
+        for candidate,score in self.results_:
+            logging.info(f"{candidate}: {self.scoring} = {score:.4f}")
+
+        best = self.results_[0][0]
+        logging.info(f"Best candidate {best}. Refitting on the full training data.")
+        return best.build_and_train_model(X_train,y_train)
     
 class ModelBuilder:
     def __init__(self,strategy:ModelBuildingStrategy):
@@ -42,7 +426,8 @@ class ModelBuilder:
     def set_strategy(self,strategy:ModelBuildingStrategy):
         logging.info("Changing model building strategy")
         self.strategy=strategy
-    def build_model(self,X_train:pd.DataFrame,y_train:pd.Series)-> RegressorMixin:
+    @instrument
+    def build_model(self,X_train:pd.DataFrame,y_train:pd.Series=None)-> RegressorMixin:
         logging.info("Building and trainig the model using the selected strategy.")
         return self.strategy.build_and_train_model(X_train,y_train)
     
@@ -54,4 +439,26 @@ if __name__ == "__main__":
     
     model_builder = ModelBuilder(LinearRegressionStrategy())
     trained_model = model_builder.build_model(X_train,y_train)
-    print(trained_model.named_steps["model"].coef_)
\ No newline at end of file
+    print(trained_model.named_steps["model"].coef_)
+
+    ## Search over several model families in parallel
+    X_numeric = X_train.select_dtypes(include="number").fillna(0)
+    search = ModelSearchStrategy(
+        candidates=[
+            RidgeRegressionStrategy(alpha=1.0),
+            RidgeRegressionStrategy(alpha=10.0),
+            LassoRegressionStrategy(alpha=100.0),
+            ElasticNetRegressionStrategy(alpha=1.0,l1_ratio=0.5),
+            GradientBoostingStrategy(n_estimators=200),
+            RandomForestStrategy(n_estimators=200),
+        ],
+        n_workers=4,
+    )
+    model_builder.set_strategy(search)
+    best_model = model_builder.build_model(X_numeric,y_train)
+
+    ## Incremental retraining , only the new rows are processed
+    incremental = IncrementalLinearRegressionStrategy()
+    model_builder.set_strategy(incremental)
+    model = model_builder.build_model(X_numeric.iloc[:2000],y_train.iloc[:2000])
+    model = incremental.partial_fit(X_numeric.iloc[2000:],y_train.iloc[2000:])
@@ -2,7 +2,9 @@ import logging
 from abc import ABC , abstractmethod
 from sklearn.base import RegressorMixin
 from sklearn.metrics import mean_squared_error,r2_score
+import numpy as np
 import pandas as pd
+from src.instrumentation import instrument
 
 logging.basicConfig(level=logging.INFO,format="%(asctime)s - %(levelname)s - %(message)s ")
 ## Abstract class for the Model evaluation to implement evaluate model method
@@ -27,6 +29,118 @@ class RegressionModelEvaluationStrategy(ModelEvaluationStrategy):
         logging.info(f"Model Evaluation Metrics:{metrics}")
         return metrics
     
+## Evaluation engine that works on the residuals in one vectorized pass.
+## metrics -> MSE , RMSE , MAE , MAPE , RMSLE , R2 and quantiles of the absolute error
+## segments -> the same metrics per group , either a column of X_test (segment_column , e.g. a
+##             label encoded "Neighborhood") or price bands of the true price (price_bands edges).
+##             Computed with np.bincount on the group codes , no loop over the groups.
+## confidence_intervals -> bootstrap percentile intervals. Every resample is a row of a
+##             multinomial count matrix , so the resampled sums are matrix products and
+##             the n_bootstrap draws are processed in batches of at most batch_size rows whose
+##             count matrix fits in memory_budget_mb (at least one draw per batch).
+class DetailedRegressionEvaluationStrategy(ModelEvaluationStrategy):
+    def __init__(self,segment_column=None,price_bands=None,error_quantiles=(0.5,0.9,0.99),
+                 n_bootstrap=1000,confidence=0.95,batch_size=250,memory_budget_mb=256,random_state=42):
+        if segment_column is not None and price_bands is not None:
+            raise ValueError("Use either segment_column or price_bands , not both.")
+        self.segment_column = segment_column
+        self.price_bands = price_bands
+        self.error_quantiles = error_quantiles
+        self.n_bootstrap = n_bootstrap
+        self.confidence = confidence
+        self.batch_size = batch_size
+        self.memory_budget_mb = memory_budget_mb
+        self.random_state = random_state
+
+    def _point_metrics(self,y_true:np.ndarray,y_pred:np.ndarray) -> dict:
+        errors = y_pred - y_true
+        abs_errors = np.abs(errors)
+        squared = errors ** 2
+        mse = squared.mean()
+        nonzero = y_true != 0
+        metrics = {
+            "Mean Squared Error": mse,
+            "RMSE": np.sqrt(mse),
+            "MAE": abs_errors.mean(),
+            "MAPE": (abs_errors[nonzero] / np.abs(y_true[nonzero])).mean(),
+            "R2_Score": 1 - squared.sum() / ((y_true - y_true.mean()) ** 2).sum(),
+        }
+        ## RMSLE is only defined for non negative values , negative predictions are clipped to 0
+        if (y_true >= 0).all():
+            log_errors = np.log1p(np.clip(y_pred,0,None)) - np.log1p(y_true)
+            metrics["RMSLE"] = np.sqrt((log_errors ** 2).mean())
+        for q,value in zip(self.error_quantiles,np.quantile(abs_errors,self.error_quantiles)):
+            metrics[f"AbsError_P{q * 100:g}"] = value
+        return {name: float(value) for name,value in metrics.items()}
+
+    def _segment_metrics(self,X_test:pd.DataFrame,y_true:np.ndarray,y_pred:np.ndarray) -> pd.DataFrame:
+        if self.segment_column is not None:
+            labels = X_test[self.segment_column].to_numpy()
+        else:
+            labels = pd.cut(y_true,bins=self.price_bands)
+        codes,names = pd.factorize(labels,sort=True)
+        ## rows outside the price bands or without a segment get the code -1 and are left out
+        valid = codes >= 0
+        codes,y_true,y_pred = codes[valid],y_true[valid],y_pred[valid]
+        n_groups = len(names)
+        errors = y_pred - y_true
+        count = np.bincount(codes,minlength=n_groups)
+        sum_squared = np.bincount(codes,weights=errors ** 2,minlength=n_groups)
+        sum_abs = np.bincount(codes,weights=np.abs(errors),minlength=n_groups)
+        nonzero = y_true != 0
+        sum_ape = np.bincount(codes[nonzero],weights=np.abs(errors[nonzero]) / np.abs(y_true[nonzero]),minlength=n_groups)
+        count_nonzero = np.bincount(codes[nonzero],minlength=n_groups)
+        sum_y = np.bincount(codes,weights=y_true,minlength=n_groups)
+        sum_y2 = np.bincount(codes,weights=y_true ** 2,minlength=n_groups)
+        total_ss = sum_y2 - sum_y ** 2 / count
+        with np.errstate(divide="ignore",invalid="ignore"):
+            segments = pd.DataFrame({
+                "count": count,
+                "RMSE": np.sqrt(sum_squared / count),
+                "MAE": sum_abs / count,
+                "MAPE": sum_ape / count_nonzero,
+                "R2_Score": 1 - sum_squared / total_ss,
+            },index=pd.Index(names.astype(str),name=self.segment_column or "price_band"))
+        return segments
+
+    def _bootstrap(self,y_true:np.ndarray,y_pred:np.ndarray) -> dict:
+        rng = np.random.default_rng(self.random_state)
+        n = len(y_true)
+        errors = y_pred - y_true
+        columns = np.column_stack([errors ** 2,np.abs(errors),y_true,y_true ** 2])
+        ## int64 counts plus their float64 product operand , 16 bytes per cell
+        batch_size = max(1,min(self.batch_size,self.memory_budget_mb * 1024**2 // (16 * n)))
+        draws = []
+        for start in range(0,self.n_bootstrap,batch_size):
+            size = min(batch_size,self.n_bootstrap - start)
+            weights = rng.multinomial(n,np.full(n,1 / n),size=size)
+            draws.append(weights @ columns / n)
+        sums = np.vstack(draws)
+        mse,mae,mean_y,mean_y2 = sums.T
+        with np.errstate(divide="ignore",invalid="ignore"):
+            r2 = 1 - mse / (mean_y2 - mean_y ** 2)
+        alpha = (1 - self.confidence) / 2
+        intervals = {}
+        for name,values in {"Mean Squared Error": mse,"RMSE": np.sqrt(mse),"MAE": mae,"R2_Score": r2}.items():
+            low,high = np.nanquantile(values,[alpha,1 - alpha])
+            intervals[name] = (float(low),float(high))
+        return intervals
+
+    def evaluate_model(self, model:RegressorMixin, X_test:pd.DataFrame, y_test:pd.Series)-> dict:
+        logging.info("Predicting using the trained model.")
+        y_pred = np.asarray(model.predict(X_test),dtype=np.float64)
+        y_true = np.asarray(y_test,dtype=np.float64)
+
+        logging.info("Calculating Evaluation Metrics.")
+        results = self._point_metrics(y_true,y_pred)
+        if self.segment_column is not None or self.price_bands is not None:
+            results["segments"] = self._segment_metrics(X_test,y_true,y_pred)
+        if self.n_bootstrap:
+            logging.info(f"Computing {self.confidence:.0%} bootstrap intervals over {self.n_bootstrap} draws.")
+            results["confidence_intervals"] = self._bootstrap(y_true,y_pred)
+        logging.info(f"Model Evaluation Metrics:{ {name: value for name,value in results.items() if name != 'segments'} }")
+        return results
+    
 ## Here is the context class for model evaluation    
 class ModelEvaluator:
     def __init__(self,strategy:ModelEvaluationStrategy):
@@ -36,6 +150,7 @@ class ModelEvaluator:
         logging.info("Switching model Evaluation Strategy.")
         self.strategy = strategy
         
+    @instrument
     def evaluate(self, model:RegressorMixin,X_test:pd.DataFrame,y_test:pd.Series):
         logging.info("Evaluating the model")
-        self.strategy.evaluate_model(model,X_test,y_test)
\ No newline at end of file
+        return self.strategy.evaluate_model(model,X_test,y_test)
\ No newline at end of file
@@ -4,14 +4,67 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns 
 import numpy as np
+from src.execution_mode import check_execution_mode, execution_scope, working_frame
+from src.instrumentation import instrument
 
 logging.basicConfig(level = logging.INFO , format="%(asctime)s - %(levelname)s - %(message)s",force=True)
 
+## Fitted per column lower / upper bounds.
+## mask walks the columns one at a time and writes into a single row keep bitmap , so no
+## boolean frame of the input's shape is ever built. Fitting once and calling filter or clip
+## again on new data reuses the same bounds.
+class OutlierBounds:
+    def __init__(self,columns,lower,upper):
+        self.columns = list(columns)
+        self.lower = np.asarray(lower,dtype=np.float64)
+        self.upper = np.asarray(upper,dtype=np.float64)
+
+    def mask(self,df:pd.DataFrame,report=False):
+        n_rows = len(df)
+        keep = np.ones(n_rows,dtype=bool)
+        below = np.empty(n_rows,dtype=bool)
+        above = np.empty(n_rows,dtype=bool)
+        counts = np.zeros(len(self.columns),dtype=np.int64)
+        for i,column in enumerate(self.columns):
+            values = df[column].to_numpy()
+            ## NaN compares False on both sides so missing values are never outliers
+            np.less(values,self.lower[i],out=below)
+            np.greater(values,self.upper[i],out=above)
+            np.logical_or(below,above,out=below)
+            if report:
+                counts[i] = np.count_nonzero(below)
+            np.logical_not(below,out=below)
+            np.logical_and(keep,below,out=keep)
+        if report:
+            return keep,pd.Series(counts,index=self.columns,name="outliers")
+        return keep
+
+    ## Dropping rows always builds a new frame. With inplace=True the frame itself is returned
+    ## when no row is an outlier instead of a copy of it.
+    def filter(self,df:pd.DataFrame,report=False,inplace=False):
+        keep,counts = self.mask(df,report=True) if report else (self.mask(df),None)
+        df_filtered = df if inplace and keep.all() else df[keep]
+        if report:
+            return df_filtered,counts
+        return df_filtered
+
+    def clip(self,df:pd.DataFrame,inplace=False) -> pd.DataFrame:
+        df_clipped = df if inplace else df.copy(deep=False)
+        for i,column in enumerate(self.columns):
+            df_clipped[column] = df[column].clip(lower=self.lower[i],upper=self.upper[i])
+        return df_clipped
+
+
 ## Abstract class for Outlier detection
+## fit_bounds returns the compact OutlierBounds used to filter the frame
 class OutlierDetectionStrategy(ABC):
     @abstractmethod
     def detect_outliers(self,df:pd.DataFrame)-> pd.DataFrame:
         pass
+
+    @abstractmethod
+    def fit_bounds(self,df:pd.DataFrame)-> OutlierBounds:
+        pass
     
 ## Zscore is a parameter is calculate for the outliers
 ## number greater than z score treated as outliers.
@@ -25,6 +78,12 @@ class ZScoreOutlierDetection(OutlierDetectionStrategy):
         outliers = z_scores > self.threshold
         logging.info(f"Outliers detected with z score threshold = {self.threshold}")
         return outliers
+
+    def fit_bounds(self, df:pd.DataFrame)-> OutlierBounds:
+        numeric = df.select_dtypes(include=[np.number])
+        mean,std = numeric.mean(),numeric.std()
+        return OutlierBounds(numeric.columns,mean - self.threshold*std,mean + self.threshold*std)
+
 class IQROutlierDetection(OutlierDetectionStrategy):
     def detect_outliers(self, df:pd.DataFrame)-> pd.DataFrame:
         logging.info("Detecting outliers using the IQR method.")
@@ -34,26 +93,56 @@ class IQROutlierDetection(OutlierDetectionStrategy):
         outliers = (df<(Q1 - 1.5*IQR)) | (df >(Q3 + 1.5 *IQR))
         logging.info("Outliers detected using the IQR method") 
         return outliers
+
+    def fit_bounds(self, df:pd.DataFrame)-> OutlierBounds:
+        numeric = df.select_dtypes(include=[np.number])
+        quartiles = numeric.quantile([0.25,0.75])
+        Q1,Q3 = quartiles.loc[0.25],quartiles.loc[0.75]
+        IQR = Q3 - Q1
+        return OutlierBounds(numeric.columns,Q1 - 1.5*IQR,Q3 + 1.5*IQR)
     
+## execution_mode -> "copy" , "cow" or "inplace" (see src/execution_mode.py). Capping writes the
+## clipped columns into the working frame , removing rows returns the frame untouched when
+## nothing is removed.
 class OutlierDetector:
-    def __init__(self,strategy:OutlierDetectionStrategy):
+    def __init__(self,strategy:OutlierDetectionStrategy,execution_mode="copy"):
         self.strategy =strategy
+        self.execution_mode = check_execution_mode(execution_mode)
         
     def set_strategy(self,strategy:OutlierDetectionStrategy):
         self.strategy = strategy
         
+    @instrument
     def detect_outliers(self,df:pd.DataFrame)->pd.DataFrame:
         logging.info("Executing outlier detection Strategy.")
         return self.strategy.detect_outliers(df)
 
-    def handle_outliers(self,df:pd.DataFrame,method="remove",**kwargs)-> pd.DataFrame:
-        outliers = self.detect_outliers(df)
+    ## Learn the bounds once , later handle_outliers calls with refit=False reuse them
+    @instrument
+    def fit(self,df:pd.DataFrame):
+        logging.info("Fitting outlier bounds.")
+        self.bounds_ = self.strategy.fit_bounds(df)
+        return self
+
+    @instrument
+    @execution_scope
+    def handle_outliers(self,df:pd.DataFrame,method="remove",refit=True,report=False,**kwargs)-> pd.DataFrame:
         if method == "remove":
+            if refit or getattr(self,"bounds_",None) is None:
+                self.fit(df)
             logging.info("Removing outliers from the dataset.")
-            df_cleaned = df[(~outliers).all(axis=1)]
+            frame = working_frame(df,self.execution_mode)
+            df_cleaned = self.bounds_.filter(df if frame is None else frame,report=report,inplace=frame is not None)
+            if report:
+                df_cleaned,self.outlier_counts_ = df_cleaned
+                logging.info(f"Outliers per column:\n{self.outlier_counts_[self.outlier_counts_ > 0]}")
         elif method =="cap":
             logging.info("Capping outliers in the dataset.")
-            df_cleaned = df.clip(lower=df.quantile(0.01),upper=df.quantile(0.99),axis =1)
+            numeric = df.select_dtypes(include=[np.number])
+            percentiles = numeric.quantile([0.01,0.99])
+            frame = working_frame(df,self.execution_mode)
+            bounds = OutlierBounds(numeric.columns,percentiles.loc[0.01],percentiles.loc[0.99])
+            df_cleaned = bounds.clip(df) if frame is None else bounds.clip(frame,inplace=True)
         else:
             logging.warning(f"Unknown method {method} .No outlier handling performed.")
             return df
@@ -69,6 +158,195 @@ class OutlierDetector:
             plt.title(f"Boxplot of {feature}")
             plt.show()
         logging.info("Outlier visualization completed.")
+
+## ---------------- Streaming outlier handling for data larger than memory ----------------
+
+## Running mean / variance for every column , updated chunk by chunk.
+## Each chunk is reduced with vectorized nan-aware sums and merged with the parallel
+## Welford (Chan) update , so two RunningStatistics from different workers can be merged too.
+class RunningStatistics:
+    def __init__(self):
+        self.count = None
+        self.mean = None
+        self.m2 = None
+
+    def update(self,values:np.ndarray):
+        values = np.asarray(values,dtype=np.float64)
+        count = np.sum(~np.isnan(values),axis=0).astype(np.float64)
+        with np.errstate(invalid="ignore",divide="ignore"):
+            mean = np.where(count > 0,np.nansum(values,axis=0) / np.maximum(count,1),0.0)
+        m2 = np.nansum((values - mean) ** 2,axis=0)
+        self._combine(count,mean,m2)
+        return self
+
+    def merge(self,other:"RunningStatistics"):
+        if other.count is not None:
+            self._combine(other.count,other.mean,other.m2)
+        return self
+
+    def _combine(self,count,mean,m2):
+        if self.count is None:
+            self.count,self.mean,self.m2 = count,mean,m2
+            return
+        total = self.count + count
+        safe_total = np.maximum(total,1)
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / safe_total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / safe_total
+        self.count = total
+
+    @property
+    def std(self) -> np.ndarray:
+        ## ddof = 1 like pandas
+        with np.errstate(invalid="ignore",divide="ignore"):
+            return np.sqrt(self.m2 / (self.count - 1))
+
+
+## KLL quantile sketch for one column. Values are kept in levels , an item on level h stands
+## for 2**h original values. When a level is over its capacity it is sorted and every other
+## item is promoted to the next level. Memory stays around 3 * k items whatever the stream
+## length and two sketches merge by concatenating their levels.
+class KLLSketch:
+    def __init__(self,k=200,seed=None):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self,level:int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2,int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self,values:np.ndarray):
+        values = np.asarray(values,dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate([self.levels[0],values])
+        self._compress()
+        return self
+
+    def merge(self,other:"KLLSketch"):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level,items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level],items])
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                ## keep the odd item out on this level so the total weight is preserved
+                keep = items[:1] if len(items) % 2 else items[:0]
+                items = items[len(keep):]
+                offset = self.rng.integers(2)
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1],items[offset::2]])
+                self.levels[level] = keep
+            level += 1
+
+    def quantile(self,q):
+        items = np.concatenate(self.levels)
+        if len(items) == 0:
+            return np.full(np.shape(q),np.nan)
+        weights = np.concatenate([np.full(len(items_),2.0 ** level) for level,items_ in enumerate(self.levels)])
+        order = np.argsort(items)
+        items,weights = items[order],weights[order]
+        cumulative = np.cumsum(weights)
+        positions = np.asarray(q) * cumulative[-1]
+        return items[np.minimum(np.searchsorted(cumulative,positions,side="left"),len(items) - 1)]
+
+
+## Outlier handling over an iterator of chunks in two passes.
+## fit -> one pass that collects running mean/std and a quantile sketch per numeric column
+## handle_outliers -> second pass that removes or caps the outliers chunk by chunk
+## method = "zscore" (mean +- threshold * std) or "iqr" (Q1 - 1.5 IQR , Q3 + 1.5 IQR)
+## Fitted detectors from different workers can be combined with merge.
+class StreamingOutlierDetector:
+    def __init__(self,method="zscore",threshold=3,sketch_size=200,seed=42):
+        self.method = method
+        self.threshold = threshold
+        self.sketch_size = sketch_size
+        self.seed = seed
+        self.columns = None
+        self.non_numeric = set()
+        self.statistics = RunningStatistics()
+        self.sketches = None
+
+    ## The numeric columns are taken from the first chunk. A column that turns up with text in a
+    ## later chunk (e.g. empty , so float , at the start) is coerced to numbers for the statistics
+    ## and left out of the bounds , it is not a numeric column.
+    def partial_fit(self,chunk:pd.DataFrame):
+        if self.columns is None:
+            self.columns = list(chunk.select_dtypes(include=[np.number]).columns)
+            self.sketches = [KLLSketch(self.sketch_size,seed=self.seed) for _ in self.columns]
+        block = chunk[self.columns]
+        text_columns = [column for column,dtype in block.dtypes.items() if not pd.api.types.is_numeric_dtype(dtype)]
+        if text_columns:
+            self.non_numeric.update(text_columns)
+            block = block.assign(**{column: pd.to_numeric(block[column],errors="coerce") for column in text_columns})
+        values = block.to_numpy(dtype=np.float64)
+        self.statistics.update(values)
+        for i,sketch in enumerate(self.sketches):
+            sketch.update(values[:,i])
+        return self
+
+    def fit(self,chunks):
+        logging.info(f"Collecting streaming statistics for the {self.method} method.")
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        logging.info("Streaming statistics collected.")
+        return self
+
+    def merge(self,other:"StreamingOutlierDetector"):
+        if self.columns is None:
+            self.columns,self.statistics,self.sketches = other.columns,other.statistics,other.sketches
+            self.non_numeric = set(other.non_numeric)
+            return self
+        self.non_numeric.update(other.non_numeric)
+        self.statistics.merge(other.statistics)
+        for sketch,other_sketch in zip(self.sketches,other.sketches):
+            sketch.merge(other_sketch)
+        return self
+
+    def quantiles(self,q) -> pd.Series:
+        return pd.Series([sketch.quantile(q) for sketch in self.sketches],index=self.columns)
+
+    def bounds(self) -> OutlierBounds:
+        if self.method == "zscore":
+            mean,std = self.statistics.mean,self.statistics.std
+            lower,upper = mean - self.threshold * std,mean + self.threshold * std
+        elif self.method == "iqr":
+            q1,q3 = self.quantiles(0.25).to_numpy(),self.quantiles(0.75).to_numpy()
+            iqr = q3 - q1
+            lower,upper = q1 - 1.5 * iqr,q3 + 1.5 * iqr
+        else:
+            raise ValueError(f"Unknown method {self.method}.")
+        return self._numeric_bounds(lower,upper)
+
+    def _numeric_bounds(self,lower,upper) -> OutlierBounds:
+        keep = [i for i,column in enumerate(self.columns) if column not in self.non_numeric]
+        return OutlierBounds([self.columns[i] for i in keep],np.asarray(lower)[keep],np.asarray(upper)[keep])
+
+    ## Not a generator itself so a missing fit or a bad method fails when this is called
+    def handle_outliers(self,chunks,method="remove"):
+        if self.columns is None:
+            raise ValueError("StreamingOutlierDetector must be fitted before handling outliers.")
+        if method == "remove":
+            bounds = self.bounds()
+        elif method == "cap":
+            bounds = self._numeric_bounds(self.quantiles(0.01),self.quantiles(0.99))
+        else:
+            raise ValueError(f"Unknown method {method}.")
+        logging.info(f"Streaming outlier handling with method {method}.")
+        return self._handle_chunks(chunks,bounds,method)
+
+    def _handle_chunks(self,chunks,bounds:OutlierBounds,method:str):
+        for chunk in chunks:
+            yield bounds.filter(chunk) if method == "remove" else bounds.clip(chunk)
+
         
 if __name__ == "__main__":
     
@@ -84,4 +362,10 @@ if __name__ == "__main__":
 
     # print(df_cleaned.shape)
     # # Visualize outliers in specific features
-    outlier_detector.visualize_outliers(df_cleaned, features=["SalePrice", "Gr Liv Area"])
\ No newline at end of file
+    outlier_detector.visualize_outliers(df_cleaned, features=["SalePrice", "Gr Liv Area"])
+
+    # Streaming version , statistics are collected over the chunks in one pass and the
+    # chunks are cleaned in a second pass
+    chunked = lambda: (df_numeric.iloc[i:i + 500] for i in range(0,len(df_numeric),500))
+    streaming_detector = StreamingOutlierDetector(method="iqr").fit(chunked())
+    df_streamed = pd.concat(streaming_detector.handle_outliers(chunked(),method="remove"))
@@ -0,0 +1,170 @@
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO,format="%(asctime)s - %(levelname)s - %(message)s",force=True)
+
+BACKENDS = ("shared_memory","memmap")
+
+
+## A segment can only be closed once no array points into it anymore. When the caller still
+## holds one the mapping is left to the garbage collector , unlinking works regardless.
+def _close_segment(segment:shared_memory.SharedMemory):
+    try:
+        segment.close()
+    except BufferError:
+        logging.warning(f"Shared memory {segment.name} is still referenced , it is released when those arrays are.")
+
+
+## Picklable description of a SharedDataset : only names , shapes and dtypes , so sending it to
+## a worker costs a few hundred bytes whatever the size of the data.
+## attach() maps the arrays into the calling process without copying them.
+class SharedDatasetHandle:
+    def __init__(self,backend:str,arrays:dict,feature_names:list,target_name:str=None):
+        self.backend = backend
+        self.arrays = arrays  ## name -> (shared memory name or .npy path , shape , dtype)
+        self.feature_names = feature_names
+        self.target_name = target_name
+
+    def attach(self) -> "AttachedDataset":
+        return AttachedDataset(self)
+
+
+## The arrays of a SharedDataset as seen from a worker. X and y are read only numpy views of
+## the shared buffers , frame() / target() wrap them in pandas without a copy.
+## Use it as a context manager or call close() , the data itself stays until the owner unlinks it.
+class AttachedDataset:
+    def __init__(self,handle:SharedDatasetHandle):
+        self.handle = handle
+        self._segments = []
+        self.arrays = {name: self._attach(location,shape,dtype) for name,(location,shape,dtype) in handle.arrays.items()}
+
+    def _attach(self,location,shape,dtype) -> np.ndarray:
+        if self.handle.backend == "memmap":
+            return np.load(location,mmap_mode="r")
+        ## workers started by the owner share its resource tracker , tracking the segment again
+        ## there would unlink it when the worker exits on python >= 3.13 without track=False
+        kwargs = {"track": False} if sys.version_info >= (3,13) else {}
+        segment = shared_memory.SharedMemory(name=location,**kwargs)
+        self._segments.append(segment)
+        array = np.ndarray(shape,dtype=np.dtype(dtype),buffer=segment.buf)
+        array.flags.writeable = False
+        return array
+
+    @property
+    def X(self) -> np.ndarray:
+        return self.arrays["X"]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.arrays.get("y")
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.X,columns=self.handle.feature_names,copy=False)
+
+    def target(self) -> pd.Series:
+        return None if self.y is None else pd.Series(self.y,name=self.handle.target_name,copy=False)
+
+    def close(self):
+        ## the numpy views must go before the buffers can be released
+        self.arrays = {}
+        for segment in self._segments:
+            _close_segment(segment)
+        self._segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.close()
+
+
+## Puts the numeric feature matrix (and the target) in shared memory once so process pool
+## workers can attach to it instead of each getting a pickled copy of the frame.
+## backend -> "shared_memory" (multiprocessing.shared_memory , RAM) or "memmap" (.npy files in
+##            directory , also works for processes not started by this one)
+## Used as a context manager the shared memory / files are removed on exit.
+class SharedDataset:
+    def __init__(self,X,y=None,backend="shared_memory",directory=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend}. Use one of {BACKENDS}")
+        if isinstance(X,pd.DataFrame):
+            if any(isinstance(dtype,pd.SparseDtype) for dtype in X.dtypes):
+                raise TypeError("SharedDataset only holds dense numeric data.")
+            feature_names = [str(column) for column in X.columns]
+        else:
+            feature_names = [f"x{i}" for i in range(np.shape(X)[1])]
+        X = np.asarray(X,dtype=np.float64)
+        if X.ndim != 2:
+            raise ValueError("X must be two dimensional.")
+        target_name = getattr(y,"name",None)
+
+        self.backend = backend
+        self._segments = []
+        self._directory = None
+        if backend == "memmap":
+            self._directory = tempfile.mkdtemp(prefix="shared_dataset_",dir=directory)
+        arrays = {}
+        self.arrays = {}
+        try:
+            for name,values in (("X",X),("y",None if y is None else np.asarray(y,dtype=np.float64))):
+                if values is not None:
+                    arrays[name] = self._share(name,values)
+        except BaseException:
+            self.unlink()
+            raise
+        self.handle = SharedDatasetHandle(backend,arrays,feature_names,target_name)
+        size = sum(array.nbytes for array in self.arrays.values())
+        logging.info(f"Shared {size / 1024**2:.1f} MB of training data using {backend}.")
+
+    def _share(self,name:str,values:np.ndarray) -> tuple:
+        if self.backend == "memmap":
+            location = os.path.join(self._directory,f"{name}.npy")
+            array = np.lib.format.open_memmap(location,mode="w+",dtype=values.dtype,shape=values.shape)
+        else:
+            segment = shared_memory.SharedMemory(create=True,size=max(values.nbytes,1))
+            self._segments.append(segment)
+            location = segment.name
+            array = np.ndarray(values.shape,dtype=values.dtype,buffer=segment.buf)
+        array[...] = values
+        self.arrays[name] = array
+        return location,values.shape,values.dtype.str
+
+    @property
+    def X(self) -> np.ndarray:
+        return self.arrays["X"]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.arrays.get("y")
+
+    def unlink(self):
+        self.arrays = {}
+        for segment in self._segments:
+            _close_segment(segment)
+            segment.unlink()
+        self._segments = []
+        if self._directory is not None:
+            shutil.rmtree(self._directory,ignore_errors=True)
+            self._directory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.unlink()
+
+
+if __name__ == "__main__":
+    X = pd.DataFrame(np.random.default_rng(0).normal(size=(100_000,20)))
+    y = pd.Series(np.random.default_rng(1).normal(size=100_000),name="SalePrice")
+
+    ## Only dataset.handle is pickled to the workers , there they attach to the same memory
+    with SharedDataset(X,y) as dataset:
+        with dataset.handle.attach() as attached:
+            print(attached.frame().shape,attached.target().mean())
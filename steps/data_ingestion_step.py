@@ -0,0 +1,11 @@
+import os
+import pandas as pd
+from src.ingest_data import DataIngestorFactory
+
+
+## Read the raw data into a DataFrame with the ingestor that matches the file extension
+def data_ingestion_step(file_path:str) -> pd.DataFrame:
+    file_extension = os.path.splitext(file_path)[1]
+    data_ingestor = DataIngestorFactory.get_data_ingestor(file_extension)
+    df = data_ingestor.ingest(file_path)
+    return df
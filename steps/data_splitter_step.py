@@ -0,0 +1,9 @@
+import pandas as pd
+from src.data_splitter import DataDSplitter, SimpleTrainTestSplit
+
+
+## Split the data into train and test sets
+def data_splitter_step(df:pd.DataFrame,target_column:str,test_size=0.2,random_state=42):
+    splitter = DataDSplitter(SimpleTrainTestSplit(test_size=test_size,random_state=random_state))
+    X_train,X_test,y_train,y_test = splitter.split(df,target_column)
+    return X_train,X_test,y_train,y_test
@@ -0,0 +1,31 @@
+import pandas as pd
+from src.feature_engineering import (
+    FeatureEngineer,
+    LogTransformation,
+    MinMaxScaling,
+    OneHotEncoding,
+    StandardScaling,
+)
+
+
+## strategy -> "log" , "standard_scaling" , "minmax_scaling" or "onehot_encoding"
+## features -> columns to transform , for one hot encoding None means every non numeric column
+def feature_engineering_step(df:pd.DataFrame,strategy="log",features:list=None) -> pd.DataFrame:
+    if features is None:
+        if strategy != "onehot_encoding":
+            raise ValueError(f"Features must be given for the {strategy} strategy.")
+        features = list(df.select_dtypes(exclude="number").columns)
+
+    if strategy == "log":
+        engineer = FeatureEngineer(LogTransformation(features))
+    elif strategy == "standard_scaling":
+        engineer = FeatureEngineer(StandardScaling(features))
+    elif strategy == "minmax_scaling":
+        engineer = FeatureEngineer(MinMaxScaling(features))
+    elif strategy == "onehot_encoding":
+        engineer = FeatureEngineer(OneHotEncoding(features))
+    else:
+        raise ValueError(f"Unsupported feature engineering strategy: {strategy}")
+
+    transformed_df = engineer.apply_feature_engineering(df)
+    return transformed_df
@@ -0,0 +1,19 @@
+import pandas as pd
+from src.handle_missing_value import (
+    DropMissingValuesStrategy,
+    FillMissingValuesStrategy,
+    MissingValueHandler,
+)
+
+
+## strategy -> "drop" or one of the fill methods : mean , median , mode , constant
+def handle_missing_values_step(df:pd.DataFrame,strategy="mean") -> pd.DataFrame:
+    if strategy == "drop":
+        handler = MissingValueHandler(DropMissingValuesStrategy(axis=0))
+    elif strategy in ["mean","median","mode","constant"]:
+        handler = MissingValueHandler(FillMissingValuesStrategy(method=strategy))
+    else:
+        raise ValueError(f"Unsupported missing value handling strategy: {strategy}")
+
+    cleaned_df = handler.handle_missing_values(df)
+    return cleaned_df
@@ -0,0 +1,10 @@
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from src.model_building import LinearRegressionStrategy, ModelBuilder, ModelBuildingStrategy
+
+
+## Train the model with the given strategy , linear regression by default
+def model_building_step(X_train:pd.DataFrame,y_train:pd.Series,strategy:ModelBuildingStrategy=None) -> Pipeline:
+    model_builder = ModelBuilder(strategy or LinearRegressionStrategy())
+    trained_model = model_builder.build_model(X_train,y_train)
+    return trained_model
@@ -0,0 +1,17 @@
+import logging
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from src.model_evaluator import ModelEvaluator, RegressionModelEvaluationStrategy
+
+
+## Evaluate the trained model on the test set and return the metrics
+def model_evaluator_step(trained_model:Pipeline,X_test:pd.DataFrame,y_test:pd.Series) -> dict:
+    if not isinstance(X_test,pd.DataFrame):
+        raise TypeError("X_test must be a pandas DataFrame.")
+    if not isinstance(y_test,pd.Series):
+        raise TypeError("y_test must be a pandas Series.")
+
+    evaluator = ModelEvaluator(strategy=RegressionModelEvaluationStrategy())
+    evaluation_metrics = evaluator.evaluate(trained_model,X_test,y_test)
+    logging.info(f"Evaluation metrics: {evaluation_metrics}")
+    return evaluation_metrics
@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import time
+import joblib
+import numpy as np
+from sklearn.pipeline import Pipeline
+
+logging.basicConfig(level=logging.INFO,format="%(asctime)s - %(levelname)s - %(message)s",force=True)
+
+ARTIFACT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+BUNDLE_FILE = "bundle.joblib"
+
+
+## Convert fitted attributes to something json can store. Big arrays are only described ,
+## the values themselves live in the joblib bundle.
+def _to_json(value,max_size=1000):
+    if isinstance(value,np.ndarray):
+        if value.size <= max_size:
+            return value.tolist()
+        return {"shape": list(value.shape),"dtype": str(value.dtype)}
+    if isinstance(value,(list,tuple)):
+        return [_to_json(item,max_size) for item in value]
+    if isinstance(value,dict):
+        return {str(key): _to_json(item,max_size) for key,item in value.items()}
+    if isinstance(value,np.generic):
+        return value.item()
+    if value is None or isinstance(value,(bool,int,float,str)):
+        return value
+    return str(value)
+
+
+## Readable summary of a fitted object for the manifest : scaler statistics , coefficients ,
+## encoder vocabularies , fill values ... Walks pipelines , plans and context classes.
+def describe_fitted(obj) -> dict:
+    if isinstance(obj,Pipeline):
+        return {"type": "Pipeline","steps": {name: describe_fitted(step) for name,step in obj.steps}}
+    summary = {"type": type(obj).__name__}
+    if hasattr(obj,"strategies"):
+        summary["strategies"] = [describe_fitted(strategy) for strategy in obj.strategies]
+    for name in ("strategy","scaler","encoder"):
+        if hasattr(obj,name):
+            summary[name] = describe_fitted(getattr(obj,name))
+    for name,value in vars(obj).items():
+        if name.endswith("_") and not name.startswith("_"):
+            summary[name] = _to_json(value)
+    if hasattr(obj,"features"):
+        summary["features"] = _to_json(obj.features)
+    return summary
+
+
+## A saved model is a versioned directory
+## manifest.json -> artifact version , feature order and a readable summary of every fitted part
+## bundle.joblib -> the fitted model and preprocessors , written uncompressed so that the
+##                  numpy arrays inside can be memory mapped on load
+## model -> the fitted Pipeline returned by ModelBuilder.build_model
+## preprocessors -> fitted objects with a transform method (MissingValueHandler , FeatureEngineeringPlan ...)
+##                  applied in order before predict
+## feature_columns -> column order the model was trained on
+def save_model(model_dir:str,model:Pipeline,preprocessors=None,feature_columns=None):
+    preprocessors = list(preprocessors or [])
+    feature_columns = list(feature_columns) if feature_columns is not None else None
+    os.makedirs(model_dir,exist_ok=True)
+    joblib.dump({"model": model,"preprocessors": preprocessors,"feature_columns": feature_columns},
+                os.path.join(model_dir,BUNDLE_FILE))
+    manifest = {
+        "version": ARTIFACT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "feature_columns": feature_columns,
+        "model": describe_fitted(model),
+        "preprocessors": [describe_fitted(preprocessor) for preprocessor in preprocessors],
+    }
+    ## manifest last , a directory without one is an incomplete artifact
+    with open(os.path.join(model_dir,MANIFEST_FILE),"w") as f:
+        json.dump(manifest,f,indent=2)
+    logging.info(f"Model artifact saved to {model_dir}")
+
+
+def load_manifest(model_dir:str) -> dict:
+    with open(os.path.join(model_dir,MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+## mmap=True maps the arrays of the bundle read only instead of reading them into memory ,
+## pages are loaded on first access and shared by every process that loads the same artifact.
+## A plain joblib file from an older save is still accepted.
+def load_model(model_path:str,mmap=True) -> dict:
+    logging.info(f"Loading model from {model_path}")
+    mmap_mode = "r" if mmap else None
+    if os.path.isfile(model_path):
+        return joblib.load(model_path,mmap_mode=mmap_mode)
+    manifest = load_manifest(model_path)
+    if manifest["version"] > ARTIFACT_VERSION:
+        raise ValueError(f"Model artifact version {manifest['version']} is newer than supported version {ARTIFACT_VERSION}.")
+    bundle = joblib.load(os.path.join(model_path,BUNDLE_FILE),mmap_mode=mmap_mode)
+    bundle["manifest"] = manifest
+    return bundle
@@ -0,0 +1,27 @@
+import logging
+import pandas as pd
+from src.outlier_detection import IQROutlierDetection, OutlierDetector, ZScoreOutlierDetection
+
+
+## Remove the rows that are outliers in any of the given columns
+## strategy -> "zscore" or "iqr"
+def outlier_detection_step(df:pd.DataFrame,columns:list,strategy="zscore",threshold=3) -> pd.DataFrame:
+    logging.info(f"Starting outlier detection step on {columns}.")
+    if df is None or df.empty:
+        raise ValueError("Input df must be a non-empty pandas DataFrame.")
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        raise ValueError(f"Columns {missing} do not exist in the DataFrame.")
+
+    if strategy == "zscore":
+        outlier_detector = OutlierDetector(ZScoreOutlierDetection(threshold=threshold))
+    elif strategy == "iqr":
+        outlier_detector = OutlierDetector(IQROutlierDetection())
+    else:
+        raise ValueError(f"Unsupported outlier detection strategy: {strategy}")
+
+    ## bounds are learned on the selected columns only and applied to the full frame
+    outlier_detector.fit(df[columns])
+    df_cleaned = outlier_detector.handle_outliers(df,refit=False,report=True)
+    logging.info(f"Outlier detection removed {len(df) - len(df_cleaned)} rows.")
+    return df_cleaned
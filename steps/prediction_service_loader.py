@@ -0,0 +1,70 @@
+import json
+import logging
+from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+from steps.model_loader import load_model
+from steps.predictor import PredictionService
+
+logging.basicConfig(level=logging.INFO,format="%(asctime)s - %(levelname)s - %(message)s",force=True)
+
+
+## Load a saved model bundle once and return a started PredictionService
+def prediction_service_loader(model_path:str,max_batch_size=256,max_wait_ms=5) -> PredictionService:
+    bundle = load_model(model_path)
+    service = PredictionService(
+        bundle["model"],
+        preprocessors=bundle["preprocessors"],
+        feature_columns=bundle["feature_columns"],
+        max_batch_size=max_batch_size,
+        max_wait_ms=max_wait_ms,
+    )
+    return service.start()
+
+
+## Small HTTP front end for the service
+## POST /predict with a JSON or CSV body -> {"predictions": [...]}
+## GET /metrics -> request latency percentiles
+## Every connection is handled on its own thread so concurrent requests share micro batches.
+def serve(service:PredictionService,host="127.0.0.1",port=8000):
+    class PredictionHandler(BaseHTTPRequestHandler):
+        def _send_json(self,status:int,body:dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type","application/json")
+            self.send_header("Content-Length",str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send_json(404,{"error": f"Unknown path {self.path}"})
+                return
+            content_type = self.headers.get("Content-Type","application/json").split(";")[0].strip()
+            payload = self.rfile.read(int(self.headers.get("Content-Length",0)))
+            try:
+                predictions = service.predict(payload,content_type=content_type)
+            except Exception as error:
+                self._send_json(400,{"error": str(error)})
+                return
+            self._send_json(200,{"predictions": predictions.tolist()})
+
+        def do_GET(self):
+            if self.path != "/metrics":
+                self._send_json(404,{"error": f"Unknown path {self.path}"})
+                return
+            self._send_json(200,service.latency_percentiles())
+
+        def log_message(self,format,*args):
+            logging.debug(format % args)
+
+    server = ThreadingHTTPServer((host,port),PredictionHandler)
+    logging.info(f"Serving predictions on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    service = prediction_service_loader("saved_model")
+    serve(service)
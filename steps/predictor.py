@@ -0,0 +1,160 @@
+import io
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO,format="%(asctime)s - %(levelname)s - %(message)s",force=True)
+
+
+## Turn a JSON (one record or a list of records) or CSV payload into a DataFrame
+def parse_payload(payload,content_type="application/json") -> pd.DataFrame:
+    if isinstance(payload,bytes):
+        payload = payload.decode("utf-8")
+    if content_type == "application/json":
+        records = json.loads(payload) if isinstance(payload,str) else payload
+        if isinstance(records,dict):
+            records = [records]
+        return pd.DataFrame.from_records(records)
+    if content_type == "text/csv":
+        return pd.read_csv(io.StringIO(payload))
+    raise ValueError(f"Unsupported content type {content_type}.")
+
+
+## Keeps the fitted preprocessors and model warm and serves predictions.
+## Concurrent predict calls are queued and a background thread groups them into one
+## micro batch (up to max_batch_size rows or max_wait_ms of waiting) , so the preprocessors
+## and model.predict run once per batch instead of once per request. Requests are only batched
+## with requests that have the same columns , a prediction never depends on its neighbours.
+## latency_percentiles reports the latency seen by each request over the last latency_window requests.
+class PredictionService:
+    def __init__(self,model,preprocessors=None,feature_columns=None,max_batch_size=256,max_wait_ms=5,latency_window=10000):
+        self.model = model
+        self.preprocessors = list(preprocessors or [])
+        self.feature_columns = feature_columns
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.latencies = deque(maxlen=latency_window)
+        self._queue = queue.Queue()
+        self._worker = None
+        self._running = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self._worker = threading.Thread(target=self._run,name="prediction-batcher",daemon=True)
+        self._worker.start()
+        logging.info("Prediction service started.")
+        return self
+
+    ## Requests still queued behind the stop are failed instead of leaving their callers waiting
+    def stop(self):
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._queue.put(None)
+        self._worker.join()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("The prediction service was stopped before this request ran."))
+        logging.info("Prediction service stopped.")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.stop()
+
+    def predict(self,payload,content_type="application/json") -> np.ndarray:
+        df = payload if isinstance(payload,pd.DataFrame) else parse_payload(payload,content_type)
+        future = Future()
+        with self._lock:
+            if not self._running:
+                raise RuntimeError("The prediction service is not running. Call start() first.")
+            self._queue.put((df,future,time.perf_counter()))
+        return future.result()
+
+    def _predict_frame(self,df:pd.DataFrame) -> np.ndarray:
+        for preprocessor in self.preprocessors:
+            df = preprocessor.transform(df)
+        if self.feature_columns is not None:
+            df = df.reindex(columns=self.feature_columns)
+        return np.asarray(self.model.predict(df))
+
+    def _next_batch(self) -> list:
+        item = self._queue.get()
+        if item is None:
+            return []
+        batch,rows = [item],len(item[0])
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._running = False
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._next_batch()
+            if not batch:
+                break
+            ## only requests with the same columns are predicted together , concatenating others
+            ## would fill the missing columns with NaN and hand them to the imputers
+            groups = {}
+            for item in batch:
+                groups.setdefault(tuple(item[0].columns),[]).append(item)
+            for group in groups.values():
+                self._run_group(group)
+
+    def _run_group(self,group:list):
+        frames = [df for df,_,_ in group]
+        try:
+            predictions = self._predict_frame(pd.concat(frames,ignore_index=True))
+        except Exception:
+            ## one bad request must not fail the others , rerun them one by one so the
+            ## error only reaches the request that caused it
+            for df,future,submitted in group:
+                self._run_single(df,future,submitted)
+            return
+        ## hand every request back its own slice of the batch predictions
+        offsets = np.cumsum([0] + [len(df) for df in frames])
+        finished = time.perf_counter()
+        for i,(_,future,submitted) in enumerate(group):
+            self.latencies.append(finished - submitted)
+            future.set_result(predictions[offsets[i]:offsets[i + 1]])
+
+    def _run_single(self,df:pd.DataFrame,future:Future,submitted:float):
+        try:
+            predictions = self._predict_frame(df)
+        except Exception as error:
+            future.set_exception(error)
+            return
+        self.latencies.append(time.perf_counter() - submitted)
+        future.set_result(predictions)
+
+    def latency_percentiles(self,percentiles=(50,90,99)) -> dict:
+        if not self.latencies:
+            return {}
+        values = np.percentile(np.fromiter(self.latencies,dtype=np.float64) * 1000,percentiles)
+        return {f"p{p}_ms": float(v) for p,v in zip(percentiles,values)}